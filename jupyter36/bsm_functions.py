@@ -1,10 +1,122 @@
 #
-# Valuation of European call options in Black-Scholes-Merton model
-# incl. Vega function and implied volatility estimation
+# Valuation of European options in Black-Scholes-Merton model
+# incl. Greeks and implied volatility estimation
 # bsm_functions.py
 #
 
+import numpy as np
+from scipy.special import ndtr
+
 # Analytical Black-Scholes-Merton (BSM) Formula
+# (all functions broadcast over NumPy arrays of parameters)
+
+
+def bsm_d1_d2(S0, K, T, r, sigma):
+    ''' Returns d1 and d2 of the BSM formula.
+
+    Parameters
+    ==========
+    S0 : float or array
+        initial stock/index level
+    K : float or array
+        strike price
+    T : float or array
+        maturity date (in year fractions)
+    r : float or array
+        constant risk-free short rate
+    sigma : float or array
+        volatility factor in diffusion term
+
+    Returns
+    =======
+    d1, d2 : float or array
+    '''
+    S0, K, T, r, sigma = (np.asarray(x, dtype=float)
+                          for x in (S0, K, T, r, sigma))
+    vol = sigma * np.sqrt(T)
+    d1 = (np.log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / vol
+    return d1, d1 - vol
+
+
+def bsm_greeks(S0, K, T, r, sigma, otype='call'):
+    ''' Value and Greeks of European options in BSM model
+    based on the same d1 and d2.
+
+    Parameters
+    ==========
+    S0 : float or array
+        initial stock/index level
+    K : float or array
+        strike price
+    T : float or array
+        maturity date (in year fractions)
+    r : float or array
+        constant risk-free short rate
+    sigma : float or array
+        volatility factor in diffusion term
+    otype : string
+        'call' or 'put'
+
+    Returns
+    =======
+    greeks : dict
+        'value', 'delta', 'gamma', 'vega', 'theta' (per year)
+        and 'rho' of the option
+    '''
+    S0, K, T, r, sigma = (np.asarray(x, dtype=float)
+                          for x in (S0, K, T, r, sigma))
+    d1, d2 = bsm_d1_d2(S0, K, T, r, sigma)
+    sqrt_T = np.sqrt(T)
+    df = np.exp(-r * T)
+    pdf_d1 = np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi)
+    gamma = pdf_d1 / (S0 * sigma * sqrt_T)
+    vega = S0 * pdf_d1 * sqrt_T
+    decay = -S0 * pdf_d1 * sigma / (2 * sqrt_T)
+    if otype == 'call':
+        N_d1, N_d2 = ndtr(d1), ndtr(d2)
+        value = S0 * N_d1 - K * df * N_d2
+        delta = N_d1
+        theta = decay - r * K * df * N_d2
+        rho = K * T * df * N_d2
+    else:
+        N_d1, N_d2 = ndtr(-d1), ndtr(-d2)
+        value = K * df * N_d2 - S0 * N_d1
+        delta = -N_d1
+        theta = decay + r * K * df * N_d2
+        rho = -K * T * df * N_d2
+    return {'value': value, 'delta': delta, 'gamma': gamma,
+            'vega': vega, 'theta': theta, 'rho': rho}
+
+
+def bsm_value(S0, K, T, r, sigma, otype='call'):
+    ''' Valuation of European call or put option in BSM model.
+    Analytical formula.
+
+    Parameters
+    ==========
+    S0 : float or array
+        initial stock/index level
+    K : float or array
+        strike price
+    T : float or array
+        maturity date (in year fractions)
+    r : float or array
+        constant risk-free short rate
+    sigma : float or array
+        volatility factor in diffusion term
+    otype : string
+        'call' or 'put'
+
+    Returns
+    =======
+    value : float or array
+        present value of the European option
+    '''
+    d1, d2 = bsm_d1_d2(S0, K, T, r, sigma)
+    df = np.exp(-np.asarray(r, dtype=float) * T)
+    if otype == 'call':
+        return S0 * ndtr(d1) - K * df * ndtr(d2)
+    return K * df * ndtr(-d2) - S0 * ndtr(-d1)
 
 
 def bsm_call_value(S0, K, T, r, sigma):
@@ -13,33 +125,23 @@ def bsm_call_value(S0, K, T, r, sigma):
     
     Parameters
     ==========
-    S0 : float
+    S0 : float or array
         initial stock/index level
-    K : float
+    K : float or array
         strike price
-    T : float
+    T : float or array
         maturity date (in year fractions)
-    r : float
+    r : float or array
         constant risk-free short rate
-    sigma : float
+    sigma : float or array
         volatility factor in diffusion term
     
     Returns
     =======
-    value : float
+    value : float or array
         present value of the European call option
     '''
-    from math import log, sqrt, exp
-    from scipy import stats
-
-    S0 = float(S0)
-    d1 = (log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * sqrt(T))
-    d2 = (log(S0 / K) + (r - 0.5 * sigma ** 2) * T) / (sigma * sqrt(T))
-    value = (S0 * stats.norm.cdf(d1, 0.0, 1.0)
-            - K * exp(-r * T) * stats.norm.cdf(d2, 0.0, 1.0))
-      # stats.norm.cdf --> cumulative distribution function
-      #                    for normal distribution
-    return value
+    return bsm_value(S0, K, T, r, sigma, 'call')
 
 # Vega function
 
@@ -49,59 +151,142 @@ def bsm_vega(S0, K, T, r, sigma):
     
     Parameters
     ==========
-    S0 : float
+    S0 : float or array
         initial stock/index level
-    K : float
+    K : float or array
         strike price
-    T : float
+    T : float or array
         maturity date (in year fractions)
-    r : float
+    r : float or array
         constant risk-free short rate
-    sigma : float
+    sigma : float or array
         volatility factor in diffusion term
     
     Returns
     =======
-    vega : float
+    vega : float or array
         partial derivative of BSM formula with respect
         to sigma, i.e. Vega
 
     '''
-    from math import log, sqrt
-    from scipy import stats
+    d1, d2 = bsm_d1_d2(S0, K, T, r, sigma)
+    return S0 * np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi) * np.sqrt(T)
+
+# Implied volatility functions
 
-    S0 = float(S0)
-    d1 = (log(S0 / K) + (r + 0.5 * sigma ** 2) * T) / (sigma * sqrt(T))
-    vega = S0 * stats.norm.pdf(d1, 0.0, 1.0) * sqrt(T)
-    return vega
 
-# Implied volatility function
+def bsm_imp_vol(S0, K, T, r, C0, otype='call', sigma_est=None, it=100,
+                tol=1e-10):
+    ''' Implied volatilities of European options in BSM model
+    (vectorized over whole option chains).
 
+    Starts from the rational approximation of Corrado and Miller (1996)
+    and iterates Newton steps, safeguarded by bisection on a bracket
+    that is maintained per option; options drop out as soon as they
+    have converged.
 
-def bsm_call_imp_vol(S0, K, T, r, C0, sigma_est, it=100):
+    Parameters
+    ==========
+    S0 : float or array
+        initial stock/index level
+    K : float or array
+        strike price
+    T : float or array
+        maturity date (in year fractions)
+    r : float or array
+        constant risk-free short rate
+    C0 : float or array
+        option quote(s)
+    otype : string
+        'call' or 'put'
+    sigma_est : float or array
+        estimate of impl. volatility (rational approximation if None)
+    it : integer
+        maximum number of iterations
+    tol : float
+        tolerance for the pricing error
+
+    Returns
+    =======
+    sigma : float or array
+        implied volatilities (NaN for quotes violating
+        the no-arbitrage bounds)
+    '''
+    arrays = np.broadcast_arrays(*(np.asarray(x, dtype=float)
+                                   for x in (S0, K, T, r, C0)))
+    shape = arrays[0].shape
+    S0, K, T, r, C0 = (x.ravel() for x in arrays)
+    X = K * np.exp(-r * T)
+    if otype == 'put':
+        # put-call parity
+        C0 = C0 + S0 - X
+    sigma = np.full(S0.shape, np.nan)
+    # only quotes within the no-arbitrage bounds (and with positive
+    # maturity) can be inverted
+    idx = np.nonzero((T > 0) & (C0 > np.maximum(S0 - X, 0)) & (C0 < S0))[0]
+    S0, K, T, r, C0, X = (x[idx] for x in (S0, K, T, r, C0, X))
+    if sigma_est is None:
+        # rational approximation of Corrado and Miller (1996)
+        a = C0 - 0.5 * (S0 - X)
+        vol = (np.sqrt(2 * np.pi / T) / (S0 + X)
+               * (a + np.sqrt(np.maximum(a ** 2 - (S0 - X) ** 2 / np.pi,
+                                         0))))
+    else:
+        vol = np.broadcast_to(np.asarray(sigma_est, dtype=float),
+                              shape).ravel()[idx].copy()
+    low = np.full(len(idx), 1e-8)
+    high = np.full(len(idx), 10.)
+    vol = np.where((vol > low) & (vol < high), vol, 0.5)
+    active = np.arange(len(idx))
+    for i in range(it):
+        if len(active) == 0:
+            break
+        s, k, t, v = S0[active], K[active], T[active], vol[active]
+        d1, d2 = bsm_d1_d2(s, k, t, r[active], v)
+        diff = s * ndtr(d1) - X[active] * ndtr(d2) - C0[active]
+        vega = s * np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi) * np.sqrt(t)
+        # the value increases with the volatility
+        high[active] = np.where(diff > 0, v, high[active])
+        low[active] = np.where(diff < 0, v, low[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = v - diff / vega
+        # bisection whenever the Newton step leaves the bracket
+        outside = ~((step > low[active]) & (step < high[active]))
+        step[outside] = 0.5 * (low[active] + high[active])[outside]
+        done = ((np.abs(diff) <= tol)
+                | (high[active] - low[active] <= tol * v))
+        vol[active] = np.where(done, v, step)
+        active = active[~done]
+    sigma[idx] = vol
+    sigma = sigma.reshape(shape)
+    if sigma.ndim == 0:
+        return float(sigma)
+    return sigma
+
+
+def bsm_call_imp_vol(S0, K, T, r, C0, sigma_est=None, it=100):
     ''' Implied volatility of European call option in BSM model.
     
     Parameters
     ==========
-    S0 : float
+    S0 : float or array
         initial stock/index level
-    K : float
+    K : float or array
         strike price
-    T : float
+    T : float or array
         maturity date (in year fractions)
-    r : float
+    r : float or array
         constant risk-free short rate
-    sigma_est : float
+    C0 : float or array
+        call option quote(s)
+    sigma_est : float or array
         estimate of impl. volatility
     it : integer
-        number of iterations
+        maximum number of iterations
     
     Returns
     =======
-    simga_est : float
+    simga_est : float or array
         numerically estimated implied volatility
     '''
-    for i in range(it):
-        sigma_est -= ((bsm_call_value(S0, K, T, r, sigma_est) - C0)
-                        / bsm_vega(S0, K, T, r, sigma_est))
-    return sigma_est
+    return bsm_imp_vol(S0, K, T, r, C0, 'call', sigma_est, it)
@@ -1,27 +1,28 @@
 #
-# Valuation of European call options in Black-Scholes-Merton Model
-# incl. Vega function and implied volatility estimation
+# Valuation of European options in Black-Scholes-Merton Model
+# incl. Greeks and implied volatility estimation
 # -- class-based implementation
 # bsm_option_class.py
 #
 
-from math import log, sqrt, exp
-from scipy import stats
+import numpy as np
+
+from bsm_functions import bsm_greeks, bsm_value, bsm_vega, bsm_imp_vol
 
 class call_option(object):
     ''' Class for European call options in BSM model.
     
     Attributes
     ==========
-    S0 : float
+    S0 : float or array
         initial stock/index level
-    K : float
+    K : float or array
         strike price
-    T : float
+    T : float or array
         maturity (in year fractions)
-    r : float
+    r : float or array
         constant risk-free short rate
-    sigma : float
+    sigma : float or array
         volatility factor in diffusion term
         
     Methods
@@ -30,12 +31,20 @@ class call_option(object):
         return present value of call option
     vega : float
         return Vega of call option
+    delta, gamma, theta, rho : float
+        return the respective Greek of call option
+    greeks : dict
+        return value and all Greeks of call option
     imp_vol: float
         return implied volatility given option quote
     '''
+    otype = 'call'
     
     def __init__(self, S0, K, T, r, sigma):
-        self.S0 = float(S0)
+        if np.ndim(S0) > 0:
+            self.S0 = np.asarray(S0, dtype=float)
+        else:
+            self.S0 = float(S0)
         self.K = K
         self.T = T
         self.r = r
@@ -43,27 +52,42 @@ class call_option(object):
         
     def value(self):
         ''' Returns option value. '''
-        d1 = ((log(self.S0 / self.K)
-            + (self.r + 0.5 * self.sigma ** 2) * self.T)
-            / (self.sigma * sqrt(self.T)))
-        d2 = ((log(self.S0 / self.K)
-            + (self.r - 0.5 * self.sigma ** 2) * self.T)
-            / (self.sigma * sqrt(self.T)))
-        value = (self.S0 * stats.norm.cdf(d1, 0.0, 1.0)
-            - self.K * exp(-self.r * self.T) * stats.norm.cdf(d2, 0.0, 1.0))
-        return value
+        return bsm_value(self.S0, self.K, self.T, self.r, self.sigma,
+                         self.otype)
         
     def vega(self):
         ''' Returns Vega of option. '''
-        d1 = ((log(self.S0 / self.K)
-            + (self.r + 0.5 * self.sigma ** 2) * self.T)
-            / (self.sigma * sqrt(self.T)))
-        vega = self.S0 * stats.norm.pdf(d1, 0.0, 1.0) * sqrt(self.T)
-        return vega
+        return bsm_vega(self.S0, self.K, self.T, self.r, self.sigma)
+
+    def greeks(self):
+        ''' Returns value and Greeks of option (dict). '''
+        return bsm_greeks(self.S0, self.K, self.T, self.r, self.sigma,
+                          self.otype)
+
+    def delta(self):
+        ''' Returns Delta of option. '''
+        return self.greeks()['delta']
+
+    def gamma(self):
+        ''' Returns Gamma of option. '''
+        return self.greeks()['gamma']
+
+    def theta(self):
+        ''' Returns Theta of option (per year). '''
+        return self.greeks()['theta']
+
+    def rho(self):
+        ''' Returns Rho of option. '''
+        return self.greeks()['rho']
+
+    def imp_vol(self, C0, sigma_est=None, it=100):
+        ''' Returns implied volatility given option price (start value
+        by Corrado-Miller for sigma_est=None). '''
+        return bsm_imp_vol(self.S0, self.K, self.T, self.r, C0, self.otype,
+                           sigma_est, it)
+
 
-    def imp_vol(self, C0, sigma_est=0.2, it=100):
-        ''' Returns implied volatility given option price. '''
-        option = call_option(self.S0, self.K, self.T, self.r, sigma_est)
-        for i in range(it):
-            option.sigma -= (option.value() - C0) / option.vega()
-        return option.sigma
+class put_option(call_option):
+    ''' Class for European put options in BSM model
+    (see call_option for attributes and methods). '''
+    otype = 'put'
@@ -9,12 +9,14 @@ import datetime as dt
 
 # frame
 from get_year_deltas import get_year_deltas
+from date_grid import date_grid, get_date_grid
 from constant_short_rate import constant_short_rate
 from market_environment import market_environment
 from plot_option_stats import plot_option_stats
 
 # simulation
-from sn_random_numbers import sn_random_numbers
+from sn_random_numbers import sn_random_numbers, random_stream, \
+    correlate_random_numbers
 from simulation_class import simulation_class
 from geometric_brownian_motion import geometric_brownian_motion
 from jump_diffusion import jump_diffusion
@@ -22,8 +24,9 @@ from square_root_diffusion import square_root_diffusion
 
 # valuation
 from valuation_class import valuation_class
+from variance_reduction import control_variate
 from valuation_mcs_european import valuation_mcs_european
-from valuation_mcs_american import valuation_mcs_american
+from valuation_mcs_american import valuation_mcs_american, lsm_present_values
 
 # portfolio
 from derivatives_position import derivatives_position
@@ -0,0 +1,92 @@
+#
+# DX Library Frame
+# date_grid.py
+#
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# cache for the time grids constructed before
+date_grid_cache = OrderedDict()
+date_grid_cache_size = 64
+
+
+class date_grid(object):
+    ''' Class for time grids with integer day offsets, year fractions
+    and constant time lookup of the dates.
+
+    Attributes
+    ==========
+    dates : array
+        sorted datetime objects of the grid (read-only)
+    days : array
+        int64 day offsets relative to the first date
+    year_deltas : array
+        year fractions relative to the first date
+    index : dict
+        position in the grid by date
+
+    Methods
+    =======
+    get_index :
+        returns the position of a date in the grid
+    '''
+
+    def __init__(self, dates, day_count=365.):
+        self.dates = np.asarray(dates)
+        self.dates.flags.writeable = False
+        values = pd.DatetimeIndex(self.dates).values
+        # whole days as with datetime.timedelta.days
+        self.days = (values - values[0]).astype(
+            'timedelta64[D]').astype(np.int64)
+        self.year_deltas = self.days / day_count
+        self.index = {date: i for i, date in enumerate(self.dates)}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def get_index(self, date):
+        ''' Returns the position of date in the grid; KeyError if the
+        date is not part of the grid. '''
+        return self.index[date]
+
+
+def get_date_grid(start, end, frequency, special_dates=None):
+    ''' Returns the (memoized) time grid from start to end with the
+    given frequency, enhanced by start, end and the special dates.
+
+    Parameters
+    ==========
+    start : datetime object
+        first date of the grid
+    end : datetime object
+        last date of the grid
+    frequency : string
+        pandas frequency string, e.g. 'B' for Business Day,
+        'W' for Weekly, 'M' for Monthly
+    special_dates : list
+        further dates to be part of the grid (e.g. maturities)
+
+    Results
+    =======
+    grid : instance of date_grid
+    '''
+    if special_dates is None:
+        special_dates = []
+    key = (start, end, frequency, tuple(sorted(set(special_dates))))
+    try:
+        grid = date_grid_cache[key]
+        date_grid_cache.move_to_end(key)
+        return grid
+    except KeyError:
+        pass
+    dates = pd.date_range(start=start, end=end, freq=frequency)
+    dates = dates.append(pd.DatetimeIndex([start, end] + list(key[3])))
+    # delete duplicates and sort
+    dates = dates.unique().sort_values()
+    grid = date_grid(dates.to_pydatetime())
+    date_grid_cache[key] = grid
+    if len(date_grid_cache) > date_grid_cache_size:
+        # remove least recently used time grid
+        date_grid_cache.popitem(last=False)
+    return grid
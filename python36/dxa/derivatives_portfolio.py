@@ -4,6 +4,7 @@
 #
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 from dx_valuation import *
 
@@ -17,6 +18,47 @@ otypes = {'European' : valuation_mcs_european,
           'American' : valuation_mcs_american}
 
 
+def get_position_statistics(position, valuation_object, fixed_seed=False):
+    ''' Returns the statistics (value, Delta, Vega) of a single
+    derivatives position as list. '''
+    pv = valuation_object.present_value(fixed_seed=fixed_seed)
+    return [
+        position.name,
+        position.quantity,
+        # calculate all present values for the single instruments
+        pv,
+        valuation_object.currency,
+        # single instrument value times quantity
+        pv * position.quantity,
+        # calculate Delta of position
+        valuation_object.delta() * position.quantity,
+        # calculate Vega of position
+        valuation_object.vega() * position.quantity,
+    ]
+
+
+def get_group_statistics(group, fixed_seed=False, seed=None):
+    ''' Returns the statistics for a group of derivatives positions
+    (sharing the same underlying) as dictionary; used by the worker
+    processes for parallel valuation.
+
+    Parameters
+    ==========
+    group : list
+        list of (key, position, valuation_object) tuples
+    fixed_seed : Boolean
+        flag for fixed rng seed
+    seed : int
+        seed for the global random state of the worker process
+        (forked workers inherit the state of the parent otherwise)
+    '''
+    if seed is not None:
+        np.random.seed(seed)
+    return {pos: get_position_statistics(position, valuation_object,
+                                         fixed_seed)
+            for pos, position, valuation_object in group}
+
+
 class derivatives_portfolio(object):
     ''' Class for building portfolios of derivatives positions.
 
@@ -72,24 +114,15 @@ class derivatives_portfolio(object):
         # generate general time grid
         start = self.val_env.constants['starting_date']
         end = self.val_env.constants['final_date']
-        time_grid = pd.date_range(start=start,end=end,
-                    freq=self.val_env.constants['frequency']
-                    ).to_pydatetime()
-        time_grid = list(time_grid)
+        # maturities are added to the (memoized) time grid
         for pos in self.positions:
             maturity_date = positions[pos].mar_env.constants['maturity']
-            if maturity_date not in time_grid:
-                time_grid.insert(0, maturity_date)
+            if maturity_date not in self.special_dates:
                 self.special_dates.append(maturity_date)
-        if start not in time_grid:
-            time_grid.insert(0, start)
-        if end not in time_grid:
-            time_grid.append(end)
-        # delete duplicate entries
-        time_grid = list(set(time_grid))
-        # sort dates in time_grid
-        time_grid.sort()
-        self.time_grid = np.array(time_grid)
+        self.date_grid = get_date_grid(start, end,
+                                       self.val_env.constants['frequency'],
+                                       self.special_dates)
+        self.time_grid = self.date_grid.dates
         self.val_env.add_list('time_grid', self.time_grid)
  
         if correlations is not None:
@@ -115,11 +148,24 @@ class derivatives_portfolio(object):
 
             # random numbers array, to be used by
             # all underlyings (if correlations exist)
+            rn_method = self.val_env.constants.get('rn_method', 'legacy')
+            if rn_method == 'legacy':
+                rng = None
+            else:
+                # random stream of the portfolio
+                rng = random_stream((self.name, 0, 0), self.fixed_seed)
             random_numbers = sn_random_numbers((len(rn_set),
                                         len(self.time_grid),
                                       self.val_env.constants['paths']),
-                                      fixed_seed=self.fixed_seed)
-
+                                      fixed_seed=self.fixed_seed, rng=rng,
+                                      method=('sobol' if rn_method == 'sobol'
+                                              else 'pseudo'),
+                                      time_list=get_year_deltas(
+                                          self.time_grid))
+            # correlate once for all underlyings (in place); every
+            # underlying then works on a view of its own set
+            correlate_random_numbers(random_numbers, cholesky_matrix)
+            self.val_env.add_constant('rn_correlated', True)
 
             # add all to valuation environment that is
             # to be shared with every underlying   
@@ -165,26 +211,45 @@ class derivatives_portfolio(object):
             self.positions[pos].get_info()
             print(bar)
 
-    def get_statistics(self, fixed_seed=False):
-        ''' Provides portfolio statistics. '''
-        res_list = []
-        # iterate over all positions in portfolio
-        for pos, value in self.valuation_objects.items():
-            p = self.positions[pos]
-            pv = value.present_value(fixed_seed=fixed_seed)
-            res_list.append([
-                p.name,
-                p.quantity,
-                # calculate all present values for the single instruments
-                pv,
-                value.currency,
-                # single instrument value times quantity
-                pv * p.quantity,
-                # calculate Delta of position
-                value.delta() * p.quantity,
-                # calculate Vega of position
-                value.vega() * p.quantity,
-            ])
+    def get_statistics(self, fixed_seed=False, workers=None):
+        ''' Provides portfolio statistics.
+
+        Parameters
+        ==========
+        fixed_seed : Boolean
+            flag for fixed rng seed
+        workers : int
+            number of worker processes for parallel valuation;
+            positions sharing the same underlying are valued
+            together by one worker (serial valuation if None)
+        '''
+        if workers is None:
+            # iterate over all positions in portfolio
+            res_list = [get_position_statistics(self.positions[pos], value,
+                                                fixed_seed)
+                        for pos, value in self.valuation_objects.items()]
+        else:
+            # group positions by underlying such that every simulation
+            # object is transferred to (only) one worker process
+            groups = {}
+            for pos, value in self.valuation_objects.items():
+                underlying = self.positions[pos].underlying
+                groups.setdefault(underlying, []).append(
+                    (pos, self.positions[pos], value))
+            if fixed_seed:
+                seeds = [None] * len(groups)
+            else:
+                # fresh seeds per group and call (from the parent state)
+                seeds = np.random.randint(0, 2 ** 31 - 1, len(groups))
+            results = {}
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(get_group_statistics, group,
+                                           fixed_seed, seed)
+                           for group, seed in zip(groups.values(), seeds)]
+                for future in futures:
+                    results.update(future.result())
+            # same order of positions as in serial valuation
+            res_list = [results[pos] for pos in self.valuation_objects]
         # generate a pandas DataFrame object with all results
         res_df = pd.DataFrame(res_list,
                      columns=['name', 'quant.', 'value', 'curr.',
@@ -3,7 +3,10 @@
 
 Interest rates in general and short rates in particular are not constant over time. You rather observe something called a term structur of insterest rates in financial markets. Simply speaking, this means that a ZCB maturing at latexmath:[$s \geq 0$] will have a different yield than another bond of the same type maturing at latexmath:[$t \geq s$]. _Yield_ in this case is defined as the quantity latexmath:[$y_t$] that solves the equation latexmath:[$D_0(t)=e^{-y_t t}$] for a ZCB maturing at latexmath:[$t$]. Analogously, yield is also the quantity latexmath:[$y_s$] that solves the equation latexmath:[$D_0(s)=e^{-y_s s}$] for a ZCB maturing at latexmath:[$s$].'''
 
+import scipy.interpolate as sci
 from constant_short_rate import *
+
+
 class deterministic_short_rate(object):
     ''' Class for discounting based on deterministic short rates,
     derived from a term structure of unit Zero-Coupon Bond yields
@@ -26,9 +29,24 @@ class deterministic_short_rate(object):
     '''
     def __init__(self, name, yield_list):
         self.name = name
-        self.yield_list = np.array(yield_list)
-        if np.sum(np.where(self.yield_list[:, 1] < 0, 1, 0)) > 0:
-            raise ValueError, 'Negative yield(s).'
+        self.yield_list = yield_list
+    @property
+    def yield_list(self):
+        return self._yield_list
+    @yield_list.setter
+    def yield_list(self, yield_list):
+        self._yield_list = np.array(yield_list)
+        if np.sum(np.where(self._yield_list[:, 1] < 0, 1, 0)) > 0:
+            raise ValueError('Negative yield(s).')
+        # fitted splines (per degree) only valid for current yields
+        self.yield_splines = {}
+    def get_yield_spline(self, k):
+        ''' Returns the (cached) spline fitted to the yields. '''
+        if k not in self.yield_splines:
+            dlist = get_year_deltas(self.yield_list[:, 0])
+            self.yield_splines[k] = sci.splrep(
+                dlist, self.yield_list[:, 1].astype(float), k=k)
+        return self.yield_splines[k]
     def get_interpolated_yields(self, time_list, dtobjects=True):
         ''' time_list either list of datetime objects or list of
         year deltas as decimal number (dtobjects=False)
@@ -37,12 +55,11 @@ class deterministic_short_rate(object):
             tlist = get_year_deltas(time_list)
         else:
             tlist = time_list
-        dlist = get_year_deltas(self.yield_list[:, 0])
         if len(time_list) <= 3:
             k = 1
         else:
             k = 3
-        yield_spline = sci.splrep(dlist, self.yield_list[:, 1], k=k)
+        yield_spline = self.get_yield_spline(k)
         yield_curve = sci.splev(tlist, yield_spline, der=0)
         yield_deriv = sci.splev(tlist, yield_spline, der=1)
         return np.array([time_list, yield_curve, yield_deriv]).T
@@ -55,16 +72,16 @@ class deterministic_short_rate(object):
         forward_rate = yield_curve[:, 1] + yield_curve[:, 2] * tlist
         return np.array((time_list, forward_rate)).T
     def get_discount_factors(self, time_list, dtobjects=True):
-        discount_factors = []
         if dtobjects is True:
             dlist = get_year_deltas(time_list)
         else:
-            dlist = time_list
-        forward_rate = self.get_forward_rates(time_list, dtobjects)
-        for no in range(len(dlist)):
-            factor = 0.0
-            for d in range(no, len(dlist) - 1):
-                factor += ((dlist[d + 1] - dlist[d])
-                        * (0.5 * (forward_rate[d + 1, 1] + forward_rate[d, 1])))
-            discount_factors.append(np.exp(-factor))
+            dlist = np.array(time_list, dtype=float)
+        forward_rate = self.get_forward_rates(dlist, dtobjects=False)
+        forward_rate = forward_rate[:, 1].astype(float)
+        # trapezoidal integrals of the forward rates between dates
+        integrals = np.diff(dlist) * 0.5 * (forward_rate[1:]
+                                            + forward_rate[:-1])
+        # reverse cumulative sum: integral from every date to the last date
+        factors = np.append(np.cumsum(integrals[::-1])[::-1], 0.0)
+        discount_factors = np.exp(-factors)
         return np.array((time_list, discount_factors)).T
\ No newline at end of file
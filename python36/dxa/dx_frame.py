@@ -5,5 +5,6 @@
 import datetime as dt
 
 from get_year_deltas import get_year_deltas
+from date_grid import date_grid, get_date_grid
 from constant_short_rate import constant_short_rate
 from market_environment import market_environment
\ No newline at end of file
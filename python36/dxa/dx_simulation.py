@@ -6,7 +6,8 @@ import numpy as np
 import pandas as pd
 
 from dx_frame import *
-from sn_random_numbers import sn_random_numbers
+from sn_random_numbers import sn_random_numbers, random_stream, \
+    correlate_random_numbers
 from simulation_class import simulation_class
 from geometric_brownian_motion import geometric_brownian_motion
 from jump_diffusion import jump_diffusion
@@ -7,5 +7,6 @@ import pandas as pd
 
 from dx_simulation import *
 from valuation_class import valuation_class
+from variance_reduction import control_variate
 from valuation_mcs_european import valuation_mcs_european
-from valuation_mcs_american import valuation_mcs_american
\ No newline at end of file
+from valuation_mcs_american import valuation_mcs_american, lsm_present_values
\ No newline at end of file
@@ -3,8 +3,9 @@
 # geometric_brownian_motion.py
 #
 import numpy as np
+from scipy.special import ndtr
 
-from sn_random_numbers import sn_random_numbers
+from get_year_deltas import get_year_deltas
 from simulation_class import simulation_class
 
 class geometric_brownian_motion(simulation_class):
@@ -26,6 +27,17 @@ class geometric_brownian_motion(simulation_class):
         updates parameters
     generate_paths :
         returns Monte Carlo paths given the market environment
+        (for a single block of paths if block is given)
+    get_bumped_paths :
+        returns the current paths for bumped initial value/volatility
+    get_score :
+        returns the likelihood ratio weights for initial value/volatility
+    get_wiener_paths :
+        returns the Brownian motion paths driving the given paths
+    get_control_variates :
+        returns maturity values and call payoffs as control variates
+    get_shifted_paths :
+        returns drift-shifted paths and likelihood ratio weights
     '''
 
     def __init__(self, name, mar_env, corr=False):
@@ -40,40 +52,120 @@ class geometric_brownian_motion(simulation_class):
             self.final_date = final_date
         self.instrument_values = None
 
-    def generate_paths(self, fixed_seed=False, day_count=365.):
+    def generate_paths(self, fixed_seed=False, day_count=365., block=None):
         if self.time_grid is None:
             self.generate_time_grid()
               # method from generic simulation class
         # number of dates for time grid    
         M = len(self.time_grid)
-        # number of paths
-        I = self.paths
-        # array initialization for path simulation
-        paths = np.zeros((M, I))
-        # initialize first date with initial_value
-        paths[0] = self.initial_value
+        if block is None:
+            # number of paths
+            I = self.paths
+        else:
+            # number of paths in block (chunked simulation)
+            I = block.stop - block.start
         if not self.correlated:
             # if not correlated, generate random numbers
-            rand = sn_random_numbers((1, M, I),
-                                     fixed_seed=fixed_seed)
+            rand = self.get_random_numbers(I, fixed_seed, block)
         else:
             # if correlated, use random number object as provided
             # in market environment
-            rand = self.random_numbers
+            rand = self.get_correlated_random_numbers(block)
         short_rate = self.discount_curve.short_rate
           # get short rate for drift of process
-        for t in range(1, len(self.time_grid)):
-            # select the right time slice from the relevant
-            # random number set
-            if not self.correlated:
-                ran = rand[t]
-            else:
-                ran = np.dot(self.cholesky_matrix, rand[:, t, :])
-                ran = ran[self.rn_set]
-            dt = (self.time_grid[t] - self.time_grid[t - 1]).days / day_count
-              # difference between two dates as year fraction
-            paths[t] = paths[t - 1] * np.exp((short_rate - 0.5
-                                              * self.volatility ** 2) * dt
-                                    + self.volatility * np.sqrt(dt) * ran)
-              # generate simulated values for the respective date
-        self.instrument_values = paths
\ No newline at end of file
+        # differences between two dates as year fractions
+        # (from whole days as with datetime.timedelta.days)
+        dt = np.diff(get_year_deltas(self.time_grid, 1.)) / day_count
+        dt = dt.reshape(-1, 1)
+        # log-returns for all dates written to one buffer and
+        # accumulated in place to the simulated values
+        paths = np.empty((M, I))
+        paths[0] = 0.
+        np.multiply(rand[1:], self.volatility * np.sqrt(dt), out=paths[1:])
+        paths[1:] += (short_rate - 0.5 * self.volatility ** 2) * dt
+        np.cumsum(paths, axis=0, out=paths)
+        np.exp(paths, out=paths)
+        paths *= self.initial_value
+        if block is None:
+            self.instrument_values = paths
+        else:
+            return paths
+
+    def get_bumped_paths(self, initial_value=None, volatility=None):
+        paths = self.get_instrument_values(fixed_seed=True)
+        if volatility is not None:
+            # recover the Brownian motion paths and rebuild the
+            # paths with the bumped volatility
+            tlist = get_year_deltas(self.time_grid).reshape(-1, 1)
+            wiener = self.get_wiener_paths(paths)
+            paths = paths * np.exp(0.5 * (self.volatility ** 2
+                                          - volatility ** 2) * tlist
+                                   + (volatility - self.volatility) * wiener)
+        if initial_value is not None:
+            # paths are proportional to the initial value
+            paths = paths * (initial_value / self.initial_value)
+        return paths
+
+    def get_wiener_paths(self, paths):
+        short_rate = self.discount_curve.short_rate
+        tlist = get_year_deltas(self.time_grid).reshape(-1, 1)
+        return ((np.log(paths / self.initial_value)
+                 - (short_rate - 0.5 * self.volatility ** 2) * tlist)
+                / self.volatility)
+
+    def get_score(self, parameter, date):
+        paths = self.get_instrument_values(fixed_seed=True)
+        time_index = self.get_time_index(date)
+        short_rate = self.discount_curve.short_rate
+        dt = np.diff(get_year_deltas(self.time_grid))[:time_index]
+        dt = dt.reshape(-1, 1)
+        # standard normal increments as used for the simulation
+        ran = ((np.log(paths[1:time_index + 1] / paths[:time_index])
+                - (short_rate - 0.5 * self.volatility ** 2) * dt)
+               / (self.volatility * np.sqrt(dt)))
+        if parameter == 'initial_value':
+            return ran[0] / (self.initial_value * self.volatility
+                             * np.sqrt(dt[0]))
+        elif parameter == 'volatility':
+            return np.sum((ran ** 2 - 1) / self.volatility
+                          - ran * np.sqrt(dt), axis=0)
+        return None
+
+    def get_control_variates(self, paths, date, strike=None):
+        time_index = self.get_time_index(date)
+        T = get_year_deltas(self.time_grid)[time_index]
+        short_rate = self.discount_curve.short_rate
+        maturity_value = paths[time_index]
+        # the value at date itself with its known expectation
+        controls = [maturity_value]
+        means = [self.initial_value * np.exp(short_rate * T)]
+        if strike is not None and T > 0:
+            # European call payoff with its BSM expectation
+            vol = self.volatility * np.sqrt(T)
+            d1 = (np.log(self.initial_value / strike)
+                  + (short_rate + 0.5 * self.volatility ** 2) * T) / vol
+            controls.append(np.maximum(maturity_value - strike, 0))
+            means.append(self.initial_value * np.exp(short_rate * T)
+                         * ndtr(d1) - strike * ndtr(d1 - vol))
+        return np.array(controls), np.array(means)
+
+    def get_shifted_paths(self, paths, date, shift=None, strike=None):
+        time_index = self.get_time_index(date)
+        tlist = get_year_deltas(self.time_grid)
+        T = tlist[time_index]
+        if shift is None:
+            if strike is None or T == 0:
+                return None
+            # shift such that the median value at date equals the strike
+            shift = ((np.log(strike / self.initial_value)
+                      - (self.discount_curve.short_rate
+                         - 0.5 * self.volatility ** 2) * T)
+                     / (self.volatility * T))
+        # Brownian motion at date
+        wiener = ((np.log(paths[time_index] / self.initial_value)
+                   - (self.discount_curve.short_rate
+                      - 0.5 * self.volatility ** 2) * T) / self.volatility)
+        shifted_paths = paths * np.exp(self.volatility * shift
+                                       * tlist.reshape(-1, 1))
+        weights = np.exp(-shift * wiener - 0.5 * shift ** 2 * T)
+        return shifted_paths, weights
@@ -2,27 +2,52 @@
 # DX Library Frame
 # get_year_deltas.py
 #
+from collections import OrderedDict
 import numpy as np
+import pandas as pd
+
+# cache for the year fractions of time grids seen before
+year_deltas_cache = OrderedDict()
+year_deltas_cache_size = 256
+
 
 def get_year_deltas(date_list, day_count=365.):
     ''' Return vector of floats with day deltas in years.
     Initial value normalized to zero.
-    
+
     Parameters
     ==========
     date_list : list or array
-        collection of datetime objects
+        collection of datetime objects, datetime64 array
+        or pandas DatetimeIndex
     day_count : float
         number of days for a year
         (to account for different conventions)
-    
+
     Results
     =======
     delta_list : array
-        year fractions
+        year fractions (a new array per call)
     '''
-
-    start = date_list[0]
-    delta_list = [(date - start).days / day_count
-                  for date in date_list]
-    return np.array(delta_list)
\ No newline at end of file
+    dates = np.asarray(date_list)
+    # datetime objects are immutable, i.e. for object arrays the object
+    # references identify the dates (the cache keeps the objects alive)
+    key = (dates.dtype.str, dates.tobytes(), day_count)
+    try:
+        delta_list = year_deltas_cache[key][0]
+        year_deltas_cache.move_to_end(key)
+        # copy such that callers cannot change the cached array
+        return delta_list.copy()
+    except KeyError:
+        pass
+    # conversion in bulk to datetime64 values
+    values = pd.DatetimeIndex(dates).values
+    seconds = (values - values[0]).astype('timedelta64[s]').astype(np.int64)
+    # whole days as with datetime.timedelta.days
+    delta_list = (seconds // 86400) / day_count
+    delta_list.flags.writeable = False
+    year_deltas_cache[key] = (delta_list, dates.copy())
+    if len(year_deltas_cache) > year_deltas_cache_size:
+        # remove least recently used time grid
+        year_deltas_cache.popitem(last=False)
+    return delta_list.copy()
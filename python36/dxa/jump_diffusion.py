@@ -4,7 +4,7 @@
 #
 import numpy as np
 
-from sn_random_numbers import sn_random_numbers
+from get_year_deltas import get_year_deltas
 from simulation_class import simulation_class
 
 class jump_diffusion(simulation_class):
@@ -26,6 +26,9 @@ class jump_diffusion(simulation_class):
         updates parameters
     generate_paths :
         returns Monte Carlo paths given the market environment
+        (for a single block of paths if block is given)
+    get_bumped_paths :
+        returns the current paths for a bumped initial value
     '''
 
     def __init__(self, name, mar_env, corr=False):
@@ -54,51 +57,86 @@ class jump_diffusion(simulation_class):
             self.final_date = final_date
         self.instrument_values = None
 
-    def generate_paths(self, fixed_seed=False, day_count=365.):
+    def get_model_parameters(self):
+        return (super(jump_diffusion, self).get_model_parameters()
+                + (self.lamb, self.mu, self.delt))
+
+    def generate_paths(self, fixed_seed=False, day_count=365., block=None):
         if self.time_grid is None:
             self.generate_time_grid()
               # method from generic simulation class
         # number of dates for time grid    
         M = len(self.time_grid)
-        # number of paths
-        I = self.paths
-        # array initialization for path simulation
-        paths = np.zeros((M, I))
-        # initialize first date with initial_value
-        paths[0] = self.initial_value
+        if block is None:
+            # number of paths
+            I = self.paths
+        else:
+            # number of paths in block (chunked simulation)
+            I = block.stop - block.start
         if self.correlated is False:
             # if not correlated, generate random numbers
-            sn1 = sn_random_numbers((1, M, I),
-                                     fixed_seed=fixed_seed)
+            sn1 = self.get_random_numbers(I, fixed_seed, block)
         else:
             # if correlated, use random number object as provided
             # in market environment
-            sn1 = self.random_numbers
-        
-        # standard normally distributed pseudorandom numbers
-        # for the jump component
-        sn2 = sn_random_numbers((1, M, I),
-                                 fixed_seed=fixed_seed)
+            sn1 = self.get_correlated_random_numbers(block)
 
         rj = self.lamb * (np.exp(self.mu + 0.5 * self.delt ** 2) - 1)
 
         short_rate = self.discount_curve.short_rate
-        for t in range(1, len(self.time_grid)):
-            # select the right time slice from the relevant
-            # random number set
-            if self.correlated is False:
-                ran = sn1[t]
+        # differences between two dates as year fractions
+        dt = np.diff(get_year_deltas(self.time_grid, 1.)) / day_count
+        # log-returns of the diffusion part for all dates
+        paths = np.empty((M, I))
+        paths[0] = 0.
+        np.multiply(sn1[1:], self.volatility * np.sqrt(dt).reshape(-1, 1),
+                    out=paths[1:])
+        paths[1:] += ((short_rate - rj - 0.5 * self.volatility ** 2)
+                      * dt).reshape(-1, 1)
+        # compound Poisson jumps: the number of jumps over all paths per
+        # date is Poisson distributed and every jump hits a path chosen
+        # uniformly, i.e. only the jumps that occur are generated
+        start = 0 if block is None else block.start
+        if self.rn_method == 'streams':
+            # jumps per group of paths (own streams)
+            groups = self.get_stream_groups(block)
+        else:
+            groups = [slice(start, start + I)]
+        for group in groups:
+            # random numbers for the jump component (from separate
+            # stream, if any; from a separately seeded state otherwise)
+            jump_rng = self.get_random_stream(fixed_seed, group,
+                                              component=1)
+            if jump_rng is not None:
+                integers = jump_rng.integers
             else:
-                # only with correlation in portfolio context
-                ran = np.dot(self.cholesky_matrix, sn1[:, t, :])
-                ran = ran[self.rn_set]
-            dt = (self.time_grid[t] - self.time_grid[t - 1]).days / day_count
-              # difference between two dates as year fraction
-            poi = np.random.poisson(self.lamb * dt, I)
-              # Poisson-distributed pseudorandom numbers for jump component
-            paths[t] = paths[t - 1] * (np.exp((short_rate - rj
-                                        - 0.5 * self.volatility ** 2) * dt
-                                    + self.volatility * np.sqrt(dt) * ran)
-                                    + (np.exp(self.mu + self.delt * 
-                                        sn2[t]) - 1) * poi)
-        self.instrument_values = paths
\ No newline at end of file
+                if fixed_seed:
+                    jump_rng = np.random.RandomState(1001)
+                else:
+                    jump_rng = np.random
+                integers = jump_rng.randint
+            n_paths = group.stop - group.start
+            jumps = jump_rng.poisson(self.lamb * dt * n_paths)
+            n = int(np.sum(jumps))
+            dates = np.repeat(np.arange(1, M), jumps)
+            hits = integers(0, n_paths, size=n) + (group.start - start)
+            sizes = self.mu + self.delt * jump_rng.standard_normal(n)
+            # several jumps per date and path add up in log space
+            np.add.at(paths, (dates, hits), sizes)
+        np.cumsum(paths, axis=0, out=paths)
+        np.exp(paths, out=paths)
+        paths *= self.initial_value
+        if block is None:
+            self.instrument_values = paths
+        else:
+            return paths
+
+    def get_bumped_paths(self, initial_value=None, volatility=None):
+        if volatility is not None:
+            # re-simulation needed
+            return None
+        paths = self.get_instrument_values(fixed_seed=True)
+        if initial_value is not None:
+            # paths are proportional to the initial value
+            paths = paths * (initial_value / self.initial_value)
+        return paths
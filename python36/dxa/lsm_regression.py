@@ -0,0 +1,134 @@
+#
+# DX Library Valuation
+# lsm_regression.py
+#
+import numpy as np
+
+
+def get_scaling(values, basis):
+    ''' Returns shift and scale for the regression inputs such that
+    the basis functions are well conditioned.
+
+    Parameters
+    ==========
+    values : array (I,)
+        values of the underlying at a given date
+    basis : string
+        'laguerre', 'chebyshev' or 'monomial'
+    '''
+    if basis == 'chebyshev':
+        # map range of values to [-1, 1]
+        low, high = np.amin(values), np.amax(values)
+        return (high + low) / 2., max((high - low) / 2., 1e-12)
+    # values relative to their mean
+    return 0.0, max(np.mean(values), 1e-12)
+
+
+def get_basis(values, bf, basis, scaling, out=None):
+    ''' Returns the basis functions of degree 0 to bf evaluated for the
+    scaled values as array of shape (bf + 1, I).
+
+    Parameters
+    ==========
+    values : array (I,)
+        values of the underlying at a given date
+    bf : int
+        highest degree of the basis functions
+    basis : string
+        'laguerre', 'chebyshev' or 'monomial'
+    scaling : tuple
+        shift and scale of the values (see get_scaling)
+    out : array (bf + 1, I)
+        buffer to write the basis functions to
+    '''
+    if out is None:
+        out = np.empty((bf + 1, len(values)))
+    out[0] = 1.0
+    if bf == 0:
+        return out
+    x = out[1]
+    np.subtract(values, scaling[0], out=x)
+    x /= scaling[1]
+    if basis == 'laguerre':
+        # L_1 = 1 - x, (k + 1) L_(k+1) = (2k + 1 - x) L_k - k L_(k-1)
+        np.subtract(1.0, x, out=x)
+        for k in range(1, bf):
+            np.add(2 * k, out[1], out=out[k + 1])
+            out[k + 1] *= out[k]
+            out[k + 1] -= k * out[k - 1]
+            out[k + 1] /= k + 1
+    elif basis == 'chebyshev':
+        # T_(k+1) = 2x T_k - T_(k-1)
+        for k in range(1, bf):
+            np.multiply(out[k], x, out=out[k + 1])
+            out[k + 1] *= 2
+            out[k + 1] -= out[k - 1]
+    else:
+        for k in range(1, bf):
+            np.multiply(out[k], x, out=out[k + 1])
+    return out
+
+
+def lsm_regression(basis_values, y):
+    ''' Returns the regression coefficients for the continuation values
+    by solving the normal equations.
+
+    Parameters
+    ==========
+    basis_values : array (bf + 1, n)
+        basis functions evaluated for the (in-the-money) paths
+    y : array (n,)
+        discounted continuation values of the same paths
+    '''
+    xtx = np.dot(basis_values, basis_values.T)
+    xty = np.dot(basis_values, y)
+    try:
+        return np.linalg.solve(xtx, xty)
+    except np.linalg.LinAlgError:
+        # e.g. too few in-the-money paths
+        return np.linalg.lstsq(xtx, xty, rcond=-1)[0]
+
+
+def lsm_exercise(values, inner_values, V, bf, basis, regression=None,
+                 buffer=None):
+    ''' Applies the optimal exercise decision at a given date to the
+    discounted continuation values V (in place) and returns the
+    regression used, i.e. (scaling, coefficients) or None.
+
+    Parameters
+    ==========
+    values : array (I,)
+        values of the underlying at the date
+    inner_values : array (I,)
+        inner values of the option at the date
+    V : array (I,)
+        discounted continuation values per path
+    bf : int
+        highest degree of the basis functions
+    basis : string
+        'laguerre', 'chebyshev' or 'monomial'
+    regression : tuple
+        regression to be used; estimated from the in-the-money
+        paths if None
+    buffer : array ((bf + 1) * I,)
+        buffer for the basis functions
+    '''
+    # regression and exercise decision for in-the-money paths only
+    itm = np.nonzero(inner_values > 0)[0]
+    if len(itm) == 0:
+        return regression
+    x = values[itm]
+    if regression is None:
+        scaling = get_scaling(x, basis)
+    else:
+        scaling = regression[0]
+    if buffer is not None:
+        buffer = buffer[:(bf + 1) * len(itm)].reshape((bf + 1, -1))
+    basis_values = get_basis(x, bf, basis, scaling, out=buffer)
+    if regression is None:
+        regression = (scaling, lsm_regression(basis_values, V[itm]))
+    # continuation values vs. inner values
+    inner = inner_values[itm]
+    exercise = inner > np.dot(regression[1], basis_values)
+    V[itm[exercise]] = inner[exercise]
+    return regression
@@ -2,8 +2,13 @@
 # DX Library Simulation
 # simulation_class.py
 #
+from collections import OrderedDict
 import numpy as np
-import pandas as pd
+
+from get_year_deltas import get_year_deltas
+from date_grid import date_grid, get_date_grid
+from sn_random_numbers import sn_random_numbers, random_stream, \
+    STREAM_PATHS
 
 
 class simulation_class(object):
@@ -22,8 +27,33 @@ class simulation_class(object):
     =======
     generate_time_grid :
         returns time grid for simulation
+    get_time_index :
+        returns the position of a date in the time grid
     get_instrument_values :
         returns the current instrument values (array)
+    get_model_parameters :
+        returns the model parameters relevant for the simulation
+    get_stream_groups :
+        returns the groups of paths with their own random streams
+    get_random_stream :
+        returns the random stream for a block of paths (if any)
+    get_random_numbers :
+        returns the standard normal random numbers for the simulation
+    get_correlated_random_numbers :
+        returns the correlated random numbers of the underlying
+        (portfolio context)
+    cache_paths :
+        adds paths to the LRU cache (within the memory budget)
+    get_path_blocks :
+        yields the simulated paths in blocks of at most chunk_size paths
+    get_bumped_paths :
+        returns the current paths for bumped parameters (if supported)
+    get_score :
+        returns the likelihood ratio weights for a parameter (if supported)
+    get_control_variates :
+        returns control variates with known expectations (if supported)
+    get_shifted_paths :
+        returns paths under a drift-shifted measure (if supported)
     '''
 
     def __init__(self, name, mar_env, corr):
@@ -43,11 +73,32 @@ class simulation_class(object):
                 self.time_grid = mar_env.get_list('time_grid')
             except:
                 self.time_grid = None
+            self.date_grid = None
             try:
                 # if there are special dates, then add these
                 self.special_dates = mar_env.get_list('special_dates')
             except:
                 self.special_dates = []
+            try:
+                # if chunk_size is given, paths are (also) provided
+                # in blocks of at most chunk_size paths
+                self.chunk_size = mar_env.get_constant('chunk_size')
+            except:
+                self.chunk_size = None
+            try:
+                # memory budget (in MB) for the cache of path sets
+                # for fixed seeds (e.g. for bump-and-revalue workflows)
+                self.cache_size = mar_env.get_constant('cache_size')
+            except:
+                self.cache_size = 0
+            self.path_cache = OrderedDict()
+            try:
+                # 'legacy' (global NumPy random state), 'streams'
+                # (independent random streams per underlying and block)
+                # or 'sobol' (scrambled Sobol numbers, Brownian bridge)
+                self.rn_method = mar_env.get_constant('rn_method')
+            except:
+                self.rn_method = 'legacy'
             self.instrument_values = None
             self.correlated = corr
             if corr is True:
@@ -56,39 +107,208 @@ class simulation_class(object):
                 self.cholesky_matrix = mar_env.get_list('cholesky_matrix')
                 self.rn_set = mar_env.get_list('rn_set')[self.name]
                 self.random_numbers = mar_env.get_list('random_numbers')
+                try:
+                    # random numbers correlated once by the portfolio
+                    self.rn_correlated = mar_env.get_constant(
+                        'rn_correlated')
+                except:
+                    self.rn_correlated = False
         except:
             print("Error parsing market environment.")
 
     def generate_time_grid(self):
         start = self.pricing_date
         end = self.final_date
-        # pandas date_range function
+        # memoized time grid based on pandas date_range function
         # freq = e.g. 'B' for Business Day,
         # 'W' for Weekly, 'M' for Monthly
-        time_grid = pd.date_range(start=start, end=end,
-                                freq=self.frequency).to_pydatetime()
-        time_grid = list(time_grid)
-        # enhance time_grid by start, end, and special_dates
-        if start not in time_grid:
-            time_grid.insert(0, start)
-            # insert start date if not in list
-        if end not in time_grid:
-            time_grid.append(end)
-            # insert end date if not in list
-        if len(self.special_dates) > 0:
-            # add all special dates
-            time_grid.extend(self.special_dates)
-            # delete duplicates
-            time_grid = list(set(time_grid))
-            # sort list
-            time_grid.sort()
-        self.time_grid = np.array(time_grid)
+        # enhanced by start, end, and special_dates
+        self.date_grid = get_date_grid(start, end, self.frequency,
+                                       self.special_dates)
+        self.time_grid = self.date_grid.dates
+
+    def get_time_index(self, date):
+        ''' Returns the position of date in the time grid (constant time
+        lookup); KeyError if the date is not part of the time grid. '''
+        if self.date_grid is None or self.date_grid.dates is not \
+                self.time_grid:
+            # time grid provided otherwise (e.g. by a portfolio)
+            self.date_grid = date_grid(self.time_grid)
+        return self.date_grid.get_index(date)
+
+    def get_model_parameters(self):
+        ''' Returns the tuple of parameters the simulated paths
+        depend on (to be extended by the model classes). '''
+        return (self.initial_value, self.volatility, self.final_date,
+                getattr(self.discount_curve, 'short_rate', None))
+
+    def get_stream_groups(self, block=None):
+        ''' Returns the groups (slices) of STREAM_PATHS paths each with
+        their own random streams (rn_method 'streams') that cover the
+        (block of) paths. The groups only depend on the number of paths,
+        such that the paths do not depend on the chunk size. '''
+        start, stop = (0, self.paths) if block is None else \
+            (block.start, block.stop)
+        return [slice(s, min(s + STREAM_PATHS, self.paths))
+                for s in range(start - start % STREAM_PATHS, stop,
+                               STREAM_PATHS)]
+
+    def get_random_stream(self, fixed_seed, block=None, component=0):
+        ''' Returns the random stream for the (block of) paths and
+        component (e.g. for jumps) or None for the global random state.
+
+        Parameters
+        ==========
+        fixed_seed : Boolean
+            use same/fixed seed for the simulation
+        block : slice
+            block of paths (chunked simulation) or group of paths
+            (rn_method 'streams', see get_stream_groups)
+        component : int
+            number of the random component of the model
+        '''
+        if self.rn_method == 'legacy':
+            return None
+        start = 0 if block is None else block.start
+        return random_stream((self.name, start, component), fixed_seed)
+
+    def get_random_numbers(self, I, fixed_seed, block=None):
+        ''' Returns the standard normal random numbers of shape (M, I)
+        for the (block of) paths according to rn_method. '''
+        M = len(self.time_grid)
+        if self.rn_method == 'streams':
+            # one stream per group of paths (block made up of whole
+            # groups); antithetic variates within the groups and no
+            # moment matching such that the numbers of a path do not
+            # depend on the block
+            return np.concatenate([
+                sn_random_numbers((1, M, group.stop - group.start),
+                                  moment_matching=False,
+                                  rng=self.get_random_stream(fixed_seed,
+                                                             group))
+                for group in self.get_stream_groups(block)], axis=1)
+        rng = self.get_random_stream(fixed_seed, block)
+        if self.rn_method == 'sobol':
+            return sn_random_numbers((1, M, I), fixed_seed=fixed_seed,
+                                     rng=rng, method='sobol',
+                                     time_list=get_year_deltas(
+                                         self.time_grid))
+        return sn_random_numbers((1, M, I), fixed_seed=fixed_seed, rng=rng)
+
+    def get_correlated_random_numbers(self, block=None):
+        ''' Returns the correlated standard normal random numbers of
+        shape (M, I) for the (block of) paths of the underlying.
+
+        Parameters
+        ==========
+        block : slice
+            block of paths (chunked simulation)
+        '''
+        rand = self.random_numbers
+        if self.rn_correlated:
+            # zero-copy view of the set of the underlying
+            rand = rand[self.rn_set]
+            if block is not None:
+                rand = rand[:, block]
+            return rand
+        if block is not None:
+            rand = rand[:, :, block]
+        # relevant row of the Cholesky matrix only
+        return np.einsum('j,jtk->tk', self.cholesky_matrix[self.rn_set],
+                         rand)
 
     def get_instrument_values(self, fixed_seed=True):
-        if self.instrument_values is None:
-            # only initiate simulation if there are no instrument values
-            self.generate_paths(fixed_seed=fixed_seed, day_count=365.)
-        elif fixed_seed is False:
-            # also initiate resimulation when fixed_seed is False
-            self.generate_paths(fixed_seed=fixed_seed, day_count=365.)
-        return self.instrument_values
\ No newline at end of file
+        if self.instrument_values is None or fixed_seed is False:
+            # simulation if there are no instrument values and
+            # resimulation when fixed_seed is False
+            if fixed_seed and self.cache_size > 0:
+                # reuse cached paths for the same parameters if possible
+                if self.time_grid is None:
+                    self.generate_time_grid()
+                key = (self.get_model_parameters(), self.time_grid[0],
+                       get_year_deltas(self.time_grid).tobytes(),
+                       fixed_seed, self.paths)
+                if key in self.path_cache:
+                    self.instrument_values = self.path_cache[key]
+                    self.path_cache.move_to_end(key)
+                else:
+                    self.generate_paths(fixed_seed=fixed_seed,
+                                        day_count=365.)
+                    self.cache_paths(key, self.instrument_values)
+            else:
+                self.generate_paths(fixed_seed=fixed_seed, day_count=365.)
+        return self.instrument_values
+
+    def cache_paths(self, key, paths):
+        ''' Adds paths to the LRU cache and removes the least recently
+        used path sets in case the memory budget is exceeded. '''
+        budget = self.cache_size * 1024 ** 2
+        if paths.nbytes > budget:
+            return
+        self.path_cache[key] = paths
+        while sum(p.nbytes for p in self.path_cache.values()) > budget:
+            self.path_cache.popitem(last=False)
+
+    def get_path_blocks(self, fixed_seed=True, chunk_size=None):
+        ''' Generator yielding the simulated paths in blocks of shape
+        (M, chunk_size) such that peak memory is bounded by the chunk size
+        and not by the total number of paths.
+
+        Parameters
+        ==========
+        fixed_seed : Boolean
+            use same/fixed seed for the simulation
+        chunk_size : int
+            maximum number of paths per block (default: self.chunk_size)
+        '''
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        if chunk_size is None or chunk_size >= self.paths:
+            # no chunking needed, provide all paths at once
+            yield self.get_instrument_values(fixed_seed=fixed_seed)
+        else:
+            for start in range(0, self.paths, chunk_size):
+                block = slice(start, min(start + chunk_size, self.paths))
+                if self.rn_method == 'legacy':
+                    # seed only for the first block such that
+                    # the blocks are based on different random numbers
+                    block_seed = fixed_seed and start == 0
+                else:
+                    # every block has its own random stream
+                    block_seed = fixed_seed
+                if self.rn_method == 'streams':
+                    # simulation of whole groups of paths (own streams)
+                    groups = self.get_stream_groups(block)
+                    whole = slice(groups[0].start, groups[-1].stop)
+                    paths = self.generate_paths(fixed_seed=block_seed,
+                                                day_count=365., block=whole)
+                    yield paths[:, block.start - whole.start:
+                                block.stop - whole.start]
+                else:
+                    yield self.generate_paths(fixed_seed=block_seed,
+                                              day_count=365., block=block)
+
+    def get_bumped_paths(self, initial_value=None, volatility=None):
+        ''' Returns the current paths for bumped parameter values based
+        on the same random numbers, i.e. without re-simulation. None if
+        not supported by the model (re-simulation needed then). '''
+        return None
+
+    def get_score(self, parameter, date):
+        ''' Returns the likelihood ratio weights per path (score) for
+        parameter ('initial_value' or 'volatility') given the paths up
+        to date. None if not supported by the model. '''
+        return None
+
+    def get_control_variates(self, paths, date, strike=None):
+        ''' Returns control variates (array (n, I)) for the values at date
+        given the (block of) paths and their expected values (array (n,)).
+        None if not supported by the model. '''
+        return None
+
+    def get_shifted_paths(self, paths, date, shift=None, strike=None):
+        ''' Returns the (block of) paths under a measure with shifted
+        drift of the driving Brownian motion (importance sampling) and
+        the likelihood ratio weights per path for the values at date.
+        None if not supported by the model. '''
+        return None
@@ -1,7 +1,14 @@
+import zlib
 import numpy as np
 
+# number of paths per random stream (rn_method 'streams'); the paths
+# are drawn in groups of this size independent of any chunking
+STREAM_PATHS = 1024
+
+
 def sn_random_numbers(shape, antithetic=True, moment_matching=True,
-                      fixed_seed=False):
+                      fixed_seed=False, rng=None, method='pseudo',
+                      time_list=None):
     ''' Returns an array of shape shape with (pseudo)random numbers
     that are standard normally distributed.
     
@@ -14,23 +21,137 @@ def sn_random_numbers(shape, antithetic=True, moment_matching=True,
     moment_matching : Boolean
         matching of first and second moments
     fixed_seed : Boolean
-        flag to fix the seed
+        flag to fix the seed (of the global NumPy random state)
+    rng : numpy.random.Generator
+        random stream to draw from instead of the global random state
+        (see random_stream)
+    method : string
+        'pseudo' for pseudorandom numbers or 'sobol' for scrambled
+        Sobol numbers in Brownian bridge order over the n dates
+        (antithetic and moment_matching are ignored for 'sobol')
+    time_list : array
+        year fractions of the n dates for the Brownian bridge
+        (default: equidistant dates)
     
     Results
     =======
     ran : (o, n, m) array of (pseudo)random numbers
     '''
-    if fixed_seed:
-        np.random.seed(1000)
-    if antithetic:
-        ran = np.random.standard_normal((shape[0], shape[1], int(shape[2] / 2)))
-        ran = np.concatenate((ran, -ran), axis=2)
+    if method == 'sobol':
+        ran = sobol_random_numbers(shape, fixed_seed, rng, time_list)
     else:
-        ran = np.random.standard_normal(shape)
-    if moment_matching:
-        ran = ran - np.mean(ran)
-        ran = ran / np.std(ran)
+        if rng is None:
+            if fixed_seed:
+                np.random.seed(1000)
+            standard_normal = np.random.standard_normal
+        else:
+            standard_normal = rng.standard_normal
+        if antithetic:
+            ran = standard_normal((shape[0], shape[1],
+                                   int(np.ceil(shape[2] / 2.))))
+            # truncate in case of an odd number of paths (e.g. last block)
+            ran = np.concatenate((ran, -ran), axis=2)[:, :, :shape[2]]
+        else:
+            ran = standard_normal(shape)
+        if moment_matching:
+            ran = ran - np.mean(ran)
+            ran = ran / np.std(ran)
     if shape[0] == 1:
         return ran[0]
     else:
-        return ran
\ No newline at end of file
+        return ran
+
+
+def sobol_random_numbers(shape, fixed_seed=False, rng=None, time_list=None):
+    ''' Returns an array of shape shape with standard normal numbers
+    based on scrambled Sobol sequences (requires SciPy >= 1.7).
+
+    The n dates are filled by a Brownian bridge such that the leading
+    Sobol dimensions carry most of the variance. The first date is the
+    starting date (zeros); the numbers for date t are the normalized
+    increments of the Brownian motion from date t - 1 to date t.
+    '''
+    from scipy.stats import qmc
+    from scipy.special import ndtri
+
+    o, n, m = shape
+    if fixed_seed and rng is None:
+        seed = 1000
+    else:
+        seed = rng
+    sobol = qmc.Sobol(d=o * (n - 1), scramble=True, seed=seed)
+    u = np.clip(sobol.random(m), 1e-12, 1 - 1e-12)
+    # dimensions ordered by bridge level first, then by factor
+    z = ndtri(u).T.reshape((n - 1, o, m))
+    if time_list is None:
+        time_list = np.arange(n, dtype=float)
+    tl = np.asarray(time_list, dtype=float) - time_list[0]
+    # Brownian bridge construction (breadth first)
+    wiener = np.zeros((o, n, m))
+    wiener[:, -1] = np.sqrt(tl[-1]) * z[0]
+    intervals = [(0, n - 1)]
+    k = 1
+    while intervals:
+        l, r = intervals.pop(0)
+        if r - l < 2:
+            continue
+        c = (l + r) // 2
+        wl = (tl[r] - tl[c]) / (tl[r] - tl[l])
+        wr = (tl[c] - tl[l]) / (tl[r] - tl[l])
+        std = np.sqrt((tl[c] - tl[l]) * (tl[r] - tl[c]) / (tl[r] - tl[l]))
+        wiener[:, c] = wl * wiener[:, l] + wr * wiener[:, r] + std * z[k]
+        k += 1
+        intervals.extend([(l, c), (c, r)])
+    ran = np.zeros((o, n, m))
+    ran[:, 1:] = (np.diff(wiener, axis=1)
+                  / np.sqrt(np.diff(tl)).reshape((1, -1, 1)))
+    return ran
+
+
+def random_stream(key, fixed_seed=True, seed=1000):
+    ''' Returns an independent random stream (Philox counter-based
+    generator) for key, e.g. (name of underlying, block of paths).
+
+    The stream only depends on seed and key (and not on the order in
+    which streams are created or used), i.e. results are reproducible
+    no matter how the work is distributed over threads or processes.
+
+    Parameters
+    ==========
+    key : tuple of int/string
+        identifies the stream (spawn key of the seed sequence)
+    fixed_seed : Boolean
+        use fixed seed; fresh entropy otherwise
+    seed : int
+        root seed for fixed_seed=True
+
+    Results
+    =======
+    rng : numpy.random.Generator
+        random stream (not to be shared between threads)
+    '''
+    spawn_key = tuple(zlib.crc32(str(k).encode()) if not isinstance(k, int)
+                      else k for k in key)
+    seed_seq = np.random.SeedSequence(seed if fixed_seed else None,
+                                      spawn_key=spawn_key)
+    return np.random.Generator(np.random.Philox(seed_seq))
+
+
+def correlate_random_numbers(random_numbers, cholesky_matrix):
+    ''' Correlates the standard normal random numbers of shape (o, n, m)
+    in place given the lower triangular Cholesky matrix of shape (o, o)
+    and returns them.
+
+    The sets are processed in descending order such that every set only
+    depends on sets not yet overwritten; zero entries of the Cholesky
+    matrix (uncorrelated risk factors) are skipped.
+    '''
+    buffer = np.empty_like(random_numbers[0])
+    for i in range(len(cholesky_matrix) - 1, -1, -1):
+        random_numbers[i] *= cholesky_matrix[i, i]
+        for j in range(i):
+            if cholesky_matrix[i, j] != 0:
+                np.multiply(random_numbers[j], cholesky_matrix[i, j],
+                            out=buffer)
+                random_numbers[i] += buffer
+    return random_numbers
@@ -3,8 +3,10 @@
 # square_root_diffusion.py
 #
 import numpy as np
+from scipy.special import ndtr
+from scipy.stats import ncx2
 
-from sn_random_numbers import sn_random_numbers
+from get_year_deltas import get_year_deltas
 from simulation_class import simulation_class
 
 
@@ -27,6 +29,9 @@ class square_root_diffusion(simulation_class):
         updates parameters
     generate_paths :
         returns Monte Carlo paths given the market environment
+        (for a single block of paths if block is given)
+    qe_step :
+        returns the values after one step of the QE scheme
     '''
 
     def __init__(self, name, mar_env, corr=False):
@@ -36,6 +41,18 @@ class square_root_diffusion(simulation_class):
             self.theta = mar_env.get_constant('theta')
         except:
             print("Error parsing market environment.")
+        try:
+            # discretization scheme: 'euler' (full truncation Euler),
+            # 'exact' (noncentral chi-square transitions) or 'qe'
+            # (quadratic-exponential scheme of Andersen (2008))
+            self.scheme = mar_env.get_constant('scheme')
+        except:
+            self.scheme = 'euler'
+        try:
+            # data type of the simulated paths, e.g. 'float32'
+            self.dtype = np.dtype(mar_env.get_constant('dtype'))
+        except:
+            self.dtype = np.dtype(np.float64)
 
     def update(self, initial_value=None, volatility=None, kappa=None,
                theta=None, final_date=None):
@@ -51,33 +68,100 @@ class square_root_diffusion(simulation_class):
             self.final_date = final_date
         self.instrument_values = None
 
-    def generate_paths(self, fixed_seed=True, day_count=365.):
+    def get_model_parameters(self):
+        return (super(square_root_diffusion, self).get_model_parameters()
+                + (self.kappa, self.theta, self.scheme, self.dtype.str))
+
+    def generate_paths(self, fixed_seed=True, day_count=365., block=None):
         if self.time_grid is None:
             self.generate_time_grid()
         M = len(self.time_grid)
-        I = self.paths
-        paths = np.zeros((M, I))
-        paths_ = np.zeros_like(paths)
+        if block is None:
+            I = self.paths
+        else:
+            I = block.stop - block.start
+        paths = np.empty((M, I), dtype=self.dtype)
         paths[0] = self.initial_value
-        paths_[0] = self.initial_value
-        if self.correlated is False:
-            rand = sn_random_numbers((1, M, I),
-                                     fixed_seed=fixed_seed)
+        rand = None
+        if self.correlated is True:
+            rand = self.get_correlated_random_numbers(block)
+        elif self.scheme != 'exact' or self.rn_method == 'sobol':
+            rand = self.get_random_numbers(I, fixed_seed, block)
         else:
-            rand = self.random_numbers
+            # noncentral chi-square numbers drawn directly
+            start = 0 if block is None else block.start
+            if self.rn_method == 'streams':
+                # per group of paths (own streams)
+                streams = [(self.get_random_stream(fixed_seed, group),
+                            slice(group.start - start, group.stop - start))
+                           for group in self.get_stream_groups(block)]
+            else:
+                rng = self.get_random_stream(fixed_seed, block)
+                if rng is None:
+                    if fixed_seed:
+                        np.random.seed(1000)
+                    rng = np.random
+                streams = [(rng, slice(0, I))]
 
+        # differences between two dates as year fractions
+        dt_list = np.diff(get_year_deltas(self.time_grid, 1.)) / day_count
+        # current values (without truncation for the Euler scheme)
+        x = np.full(I, float(self.initial_value))
         for t in range(1, len(self.time_grid)):
-            dt = (self.time_grid[t] - self.time_grid[t - 1]).days / day_count
-            if self.correlated is False:
+            dt = dt_list[t - 1]
+            if rand is not None:
                 ran = rand[t]
+            if self.scheme == 'exact':
+                df = 4 * self.theta * self.kappa / self.volatility ** 2
+                c = (self.volatility ** 2 * (1 - np.exp(-self.kappa * dt))
+                     / (4 * self.kappa))
+                nc = np.exp(-self.kappa * dt) / c * x
+                if rand is None:
+                    x = np.empty(I)
+                    for rng, paths_slice in streams:
+                        x[paths_slice] = c * rng.noncentral_chisquare(
+                            df, nc[paths_slice])
+                else:
+                    # inversion of the given standard normal numbers
+                    u = np.clip(ndtr(ran), 1e-12, 1 - 1e-12)
+                    x = c * ncx2.ppf(u, df, nc)
+            elif self.scheme == 'qe':
+                x = self.qe_step(x, dt, ran)
             else:
-                ran = np.dot(self.cholesky_matrix, rand[:, t, :])
-                ran = ran[self.rn_set]
+                # full truncation Euler discretization
+                xp = np.maximum(0, x)
+                x = (x + self.kappa * (self.theta - xp) * dt
+                     + np.sqrt(xp) * self.volatility * np.sqrt(dt)
+                     * ran)
+            paths[t] = np.maximum(0, x)
+        if block is None:
+            self.instrument_values = paths
+        else:
+            return paths
 
-            # full truncation Euler discretization
-            paths_[t] = (paths_[t - 1] + self.kappa
-                         * (self.theta - np.maximum(0, paths_[t - 1, :])) * dt
-                         + np.sqrt(np.maximum(0, paths_[t - 1, :]))
-                         * self.volatility * np.sqrt(dt) * ran)
-            paths[t] = np.maximum(0, paths_[t])
-        self.instrument_values = paths
\ No newline at end of file
+    def qe_step(self, x, dt, ran):
+        ''' Returns the values after one step of length dt of the
+        quadratic-exponential scheme of Andersen (2008) given the current
+        values x and standard normal numbers ran. '''
+        ekt = np.exp(-self.kappa * dt)
+        # conditional mean and variance of the transition
+        m = self.theta + (x - self.theta) * ekt
+        s2 = (x * self.volatility ** 2 * ekt / self.kappa * (1 - ekt)
+              + self.theta * self.volatility ** 2 / (2 * self.kappa)
+              * (1 - ekt) ** 2)
+        psi = s2 / m ** 2
+        x_new = np.empty_like(x)
+        quad = psi <= 1.5
+        # quadratic approximation (non-central chi-square like)
+        p = 2 / psi[quad]
+        b2 = p - 1 + np.sqrt(p) * np.sqrt(p - 1)
+        x_new[quad] = m[quad] / (1 + b2) * (np.sqrt(b2) + ran[quad]) ** 2
+        # exponential approximation with mass at zero
+        exp = ~quad
+        p = (psi[exp] - 1) / (psi[exp] + 1)
+        beta = (1 - p) / m[exp]
+        u = ndtr(ran[exp])
+        x_new[exp] = np.where(u <= p, 0.,
+                              np.log((1 - p) / np.maximum(1 - u, 1e-300))
+                              / beta)
+        return x_new
@@ -2,6 +2,9 @@
 # DX Library Valuation
 # valuation_class.py
 #
+import ast
+import numpy as np
+
 
 class valuation_class(object):
     ''' Basic class for single-factor valuation.
@@ -31,6 +34,12 @@ class valuation_class(object):
         returns the Delta of the derivative
     vega :
         returns the Vega of the derivative
+    compile_payoff :
+        compiles the payoff function and determines its variables
+    get_crn_greek :
+        returns a Greek by central differences on common random numbers
+    get_likelihood_ratio_greek :
+        returns a Greek by the likelihood ratio method
     '''
 
     def __init__(self, name, underlying, mar_env, payoff_func=''):
@@ -49,12 +58,37 @@ class valuation_class(object):
             self.paths = underlying.paths
             self.discount_curve = underlying.discount_curve
             self.payoff_func = payoff_func
+            self.compiled_payoff_func = None
             self.underlying = underlying
+            try:
+                # estimator for the Greeks: 'fd' (finite differences),
+                # 'crn' (central differences on common random numbers,
+                # i.e. the same paths) or 'lr' (likelihood ratio)
+                self.greeks_method = mar_env.get_constant('greeks_method')
+            except:
+                self.greeks_method = 'fd'
+            try:
+                # None, 'control_variate' or 'importance_sampling'
+                self.variance_reduction = mar_env.get_constant(
+                                            'variance_reduction')
+            except:
+                self.variance_reduction = None
+            try:
+                # drift shift for importance sampling (default: by strike)
+                self.drift_shift = mar_env.get_constant('drift_shift')
+            except:
+                self.drift_shift = None
             # provide pricing_date and maturity to underlying
             self.underlying.special_dates.extend([self.pricing_date,
                                                   self.maturity])
         except:
             print("Error parsing market environment.")
+        try:
+            # parse and compile payoff function only once
+            self.compile_payoff()
+        except SyntaxError:
+            # error reported when evaluating the payoff
+            pass
 
     def update(self, initial_value=None, volatility=None,
                strike=None, maturity=None):
@@ -71,20 +105,83 @@ class valuation_class(object):
                 self.underlying.special_dates.append(maturity)
                 self.underlying.instrument_values = None
 
-    def delta(self, interval=None, accuracy=4):
+    def compile_payoff(self):
+        ''' Compiles the payoff function (string) to a code object and
+        determines the set of variables the payoff depends on. '''
+        if self.payoff_func != self.compiled_payoff_func:
+            tree = ast.parse(self.payoff_func, mode='eval')
+            self.payoff_variables = {node.id for node in ast.walk(tree)
+                                     if isinstance(node, ast.Name)}
+            self.payoff_code = compile(tree, '<payoff_func>', 'eval')
+            self.compiled_payoff_func = self.payoff_func
+        return self.payoff_code
+
+    def __getstate__(self):
+        # code objects cannot be pickled (process pool valuation);
+        # the payoff function is compiled again when first used
+        state = self.__dict__.copy()
+        state.pop('payoff_code', None)
+        state['compiled_payoff_func'] = None
+        return state
+
+    def get_crn_greek(self, parameter, interval):
+        ''' Returns the sensitivity with regard to parameter
+        ('initial_value' or 'volatility') by central differences on
+        the same set of paths; requires a single simulation only.
+        None if not supported by the underlying. '''
+        if self.underlying.chunk_size is not None:
+            # needs the full set of paths
+            return None
+        value = getattr(self.underlying, parameter)
+        paths_right = self.underlying.get_bumped_paths(
+                        **{parameter: value + interval})
+        if paths_right is None:
+            return None
+        paths_left = self.underlying.get_bumped_paths(
+                        **{parameter: value - interval})
+        value_right = self.present_value(paths=paths_right)
+        value_left = self.present_value(paths=paths_left)
+        return (value_right - value_left) / (2 * interval)
+
+    def get_likelihood_ratio_greek(self, parameter):
+        ''' Returns the sensitivity with regard to parameter
+        ('initial_value' or 'volatility') by the likelihood ratio method
+        (also for non-smooth payoffs); requires a single simulation only.
+        None if not supported by the underlying. '''
+        if self.underlying.chunk_size is not None:
+            # needs the full set of paths
+            return None
+        # present values per path (without variance reduction)
+        paths = self.underlying.get_instrument_values(fixed_seed=True)
+        pv = self.present_value(paths=paths, full=True)[1]
+        score = self.underlying.get_score(parameter, self.maturity)
+        if score is None:
+            return None
+        return np.sum(pv * score) / len(pv)
+
+    def delta(self, interval=None, accuracy=4, method=None):
         if interval is None:
             interval = self.underlying.initial_value / 50.
-        # forward-difference approximation
-        # calculate left value for numerical Delta
-        value_left = self.present_value(fixed_seed=True)
-        # numerical underlying value for right value
-        initial_del = self.underlying.initial_value + interval
-        self.underlying.update(initial_value=initial_del)
-        # calculate right value for numerical delta
-        value_right = self.present_value(fixed_seed=True)
-        # reset the initial_value of the simulation object
-        self.underlying.update(initial_value=initial_del - interval)
-        delta = (value_right - value_left) / interval
+        if method is None:
+            method = self.greeks_method
+        delta = None
+        if method == 'lr':
+            delta = self.get_likelihood_ratio_greek('initial_value')
+        if method in ('crn', 'lr') and delta is None:
+            delta = self.get_crn_greek('initial_value', interval)
+        if delta is None:
+            # forward-difference approximation
+            # calculate left value for numerical Delta
+            value_left = self.present_value(fixed_seed=True)
+            # numerical underlying value for right value
+            initial_value = self.underlying.initial_value
+            self.underlying.update(initial_value=initial_value + interval)
+            # calculate right value for numerical delta
+            value_right = self.present_value(fixed_seed=True)
+            # reset the initial_value of the simulation object
+            # (exactly, such that cached paths can be reused)
+            self.underlying.update(initial_value=initial_value)
+            delta = (value_right - value_left) / interval
         # correct for potential numerical errors
         if delta < -1.0:
             return -1.0
@@ -93,19 +190,28 @@ class valuation_class(object):
         else:
             return round(delta, accuracy)
 
-    def vega(self, interval=0.01, accuracy=4):
+    def vega(self, interval=0.01, accuracy=4, method=None):
         if interval < self.underlying.volatility / 50.:
             interval = self.underlying.volatility / 50.
-        # forward-difference approximation
-        # calculate the left value for numerical Vega
-        value_left = self.present_value(fixed_seed=True)
-        # numerical volatility value for right value
-        vola_del = self.underlying.volatility + interval
-        # update the simulation object
-        self.underlying.update(volatility=vola_del)
-        # calculate the right value for numerical Vega
-        value_right = self.present_value(fixed_seed=True)
-        # reset volatility value of simulation object
-        self.underlying.update(volatility=vola_del - interval)
-        vega = (value_right - value_left) / interval
-        return round(vega, accuracy)
\ No newline at end of file
+        if method is None:
+            method = self.greeks_method
+        vega = None
+        if method == 'lr':
+            vega = self.get_likelihood_ratio_greek('volatility')
+        if method in ('crn', 'lr') and vega is None:
+            vega = self.get_crn_greek('volatility', interval)
+        if vega is None:
+            # forward-difference approximation
+            # calculate the left value for numerical Vega
+            value_left = self.present_value(fixed_seed=True)
+            # numerical volatility value for right value
+            volatility = self.underlying.volatility
+            # update the simulation object
+            self.underlying.update(volatility=volatility + interval)
+            # calculate the right value for numerical Vega
+            value_right = self.present_value(fixed_seed=True)
+            # reset volatility value of simulation object
+            # (exactly, such that cached paths can be reused)
+            self.underlying.update(volatility=volatility)
+            vega = (value_right - value_left) / interval
+        return round(vega, accuracy)
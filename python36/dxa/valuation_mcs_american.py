@@ -5,6 +5,7 @@
 import numpy as np
 
 from valuation_class import valuation_class
+from lsm_regression import lsm_exercise
 
 class valuation_mcs_american(valuation_class):
     ''' Class to value American options with arbitrary payoff
@@ -14,37 +15,111 @@ class valuation_mcs_american(valuation_class):
     =======
     generate_payoff :
         returns payoffs given the paths and the payoff function
+    backward_induction :
+        returns present values per path given the paths and payoffs
     present_value : 
         returns present value (LSM Monte Carlo estimator)
         according to Longstaff-Schwartz (2001)
     '''
 
-    def generate_payoff(self, fixed_seed=False):
+    def __init__(self, name, underlying, mar_env, payoff_func=''):
+        super(valuation_mcs_american, self).__init__(name, underlying,
+                                                     mar_env, payoff_func)
+        try:
+            # basis for the LSM regression: 'polyfit' (raw monomials,
+            # all paths) or 'laguerre', 'chebyshev', 'monomial' (scaled
+            # values, in-the-money paths only, normal equations)
+            self.lsm_basis = mar_env.get_constant('lsm_basis')
+        except:
+            self.lsm_basis = 'polyfit'
+
+    def generate_payoff(self, fixed_seed=False, paths=None):
         '''
         Parameters
         ==========
         fixed_seed :
             use same/fixed seed for valuation
+        paths : array
+            (block of) simulated paths to be used instead of
+            the instrument values of the underlying
         '''
+        if paths is None:
+            paths = self.underlying.get_instrument_values(
+                fixed_seed=fixed_seed)
         try:
-            strike = self.strike
-        except:
-            pass
-        paths = self.underlying.get_instrument_values(fixed_seed=fixed_seed)
-        time_grid = self.underlying.time_grid
-        try:
-            time_index_start = int(np.where(time_grid == self.pricing_date)[0])
-            time_index_end = int(np.where(time_grid == self.maturity)[0])
+            time_index_start = self.underlying.get_time_index(
+                self.pricing_date)
+            time_index_end = self.underlying.get_time_index(self.maturity)
         except:
             print("Maturity date not in time grid of underlying.")
         instrument_values = paths[time_index_start:time_index_end + 1]
         try:
-            payoff = eval(self.payoff_func)
+            payoff_code = self.compile_payoff()
+            variables = {'self': self, 'paths': paths,
+                         'instrument_values': instrument_values}
+            if 'strike' in self.payoff_variables:
+                variables['strike'] = self.strike
+            payoff = eval(payoff_code, globals(), variables)
             return instrument_values, payoff, time_index_start, time_index_end
         except:
             print("Error evaluating payoff function.")
 
-    def present_value(self, accuracy=6, fixed_seed=False, bf=5, full=False):
+    def backward_induction(self, instrument_values, inner_values,
+                           discount_factors, bf=5, regressions=None):
+        ''' Returns the present values per path by backward induction
+        and the regression coefficients used for the exercise decisions.
+
+        Parameters
+        ==========
+        instrument_values : array
+            simulated paths from pricing date to maturity
+        inner_values : array
+            inner values of the option for all paths and dates
+        discount_factors : array
+            discount factors for all dates
+        bf : int
+            number of basis functions for regression
+        regressions : dict
+            regression coefficients per date to be used;
+            estimated from the paths if None
+        '''
+        estimate = regressions is None
+        if estimate:
+            regressions = {}
+        V = inner_values[-1]
+        if self.lsm_basis != 'polyfit':
+            V = V.copy()
+            # buffer for the basis functions reused for all dates
+            buffer = np.empty((bf + 1) * V.shape[0])
+        for t in range(len(discount_factors) - 2, 0, -1):
+            # derive relevant discount factor for given time interval
+            df = discount_factors[t, 1] / discount_factors[t + 1, 1]
+            if self.lsm_basis == 'polyfit':
+                if estimate:
+                    # regression step
+                    regressions[t] = np.polyfit(instrument_values[t],
+                                                V * df, bf)
+                # calculation of continuation values per path
+                C = np.polyval(regressions[t], instrument_values[t])
+                # optimal decision step:
+                # if condition is satisfied (inner value > regressed cont.
+                # value) then take inner value; take actual cont. value
+                # otherwise
+                V = np.where(inner_values[t] > C, inner_values[t], V * df)
+                continue
+            V *= df
+            if estimate:
+                regressions[t] = lsm_exercise(
+                    instrument_values[t], inner_values[t], V, bf,
+                    self.lsm_basis, buffer=buffer)
+            elif regressions[t] is not None:
+                lsm_exercise(instrument_values[t], inner_values[t], V, bf,
+                             self.lsm_basis, regressions[t], buffer)
+        df = discount_factors[0, 1] / discount_factors[1, 1]
+        return df * V, regressions
+
+    def present_value(self, accuracy=6, fixed_seed=False, bf=5, full=False,
+                      paths=None):
         '''
         Parameters
         ==========
@@ -56,27 +131,112 @@ class valuation_mcs_american(valuation_class):
             number of basis functions for regression
         full : Boolean
             return also full 1d array of present values
+        paths : array
+            simulated paths to be used instead of
+            the instrument values of the underlying
         '''
-        instrument_values, inner_values, time_index_start, time_index_end = \
-                    self.generate_payoff(fixed_seed=fixed_seed)
-        time_list = self.underlying.time_grid[time_index_start:time_index_end + 1]
-        discount_factors = self.discount_curve.get_discount_factors(
+        if paths is not None or self.underlying.chunk_size is None:
+            instrument_values, inner_values, time_index_start, \
+                time_index_end = self.generate_payoff(fixed_seed=fixed_seed,
+                                                      paths=paths)
+            time_list = self.underlying.time_grid[
+                            time_index_start:time_index_end + 1]
+            discount_factors = self.discount_curve.get_discount_factors(
+                                time_list, dtobjects=True)
+            pv, regressions = self.backward_induction(
+                instrument_values, inner_values, discount_factors, bf)
+            result = np.sum(pv) / len(pv)
+        else:
+            # chunked valuation: the exercise policy is estimated
+            # on the first block of paths and then applied to all
+            # further blocks; the block estimators are merged
+            regressions = None
+            pv_sum = 0.0
+            count = 0
+            pv_list = []
+            for paths in self.underlying.get_path_blocks(
+                    fixed_seed=fixed_seed):
+                instrument_values, inner_values, time_index_start, \
+                    time_index_end = self.generate_payoff(paths=paths)
+                if regressions is None:
+                    time_list = self.underlying.time_grid[
+                                    time_index_start:time_index_end + 1]
+                    discount_factors = \
+                        self.discount_curve.get_discount_factors(
                             time_list, dtobjects=True)
-        V = inner_values[-1]
-        for t in range(len(time_list) - 2, 0, -1):
-            # derive relevant discount factor for given time interval
-            df = discount_factors[t, 1] / discount_factors[t + 1, 1]
-            # regression step
-            rg = np.polyfit(instrument_values[t], V * df, bf)
-            # calculation of continuation values per path
-            C = np.polyval(rg, instrument_values[t])
-            # optimal decision step:
-            # if condition is satisfied (inner value > regressed cont. value)
-            # then take inner value; take actual cont. value otherwise
-            V = np.where(inner_values[t] > C, inner_values[t], V * df)
-        df = discount_factors[0, 1] / discount_factors[1, 1]
-        result = df * np.sum(V) / len(V)
+                pv, regressions = self.backward_induction(
+                    instrument_values, inner_values, discount_factors, bf,
+                    regressions)
+                pv_sum += np.sum(pv)
+                count += len(pv)
+                if full:
+                    pv_list.append(pv)
+            result = pv_sum / count
+            if full:
+                pv = np.concatenate(pv_list)
         if full:
-            return round(result, accuracy), df * V
+            return round(result, accuracy), pv
         else:
-            return round(result, accuracy)
\ No newline at end of file
+            return round(result, accuracy)
+
+def lsm_present_values(valuation_objects, accuracy=6, fixed_seed=False,
+                       bf=5, basis=None):
+    ''' Returns the present values of American options on the same
+    underlying (LSM Monte Carlo estimators) from a single backward
+    induction over the shared simulated paths.
+
+    Parameters
+    ==========
+    valuation_objects : list
+        instances of valuation_mcs_american with the same underlying
+    accuracy : int
+        number of decimals in returned results
+    fixed_seed : boolean
+        use same/fixed seed for valuation
+    bf : int
+        number of basis functions for regression
+    basis : string
+        'laguerre', 'chebyshev' or 'monomial'
+        (default: the common lsm_basis of the valuation objects)
+
+    Results
+    =======
+    values : dict
+        present values by name of the valuation object
+    '''
+    underlying = valuation_objects[0].underlying
+    for vo in valuation_objects:
+        if vo.underlying is not underlying:
+            raise ValueError('Valuation objects need the same underlying.')
+    bases = {vo.lsm_basis for vo in valuation_objects}
+    if basis is None:
+        if len(bases) > 1:
+            raise ValueError('Valuation objects need the same lsm_basis.')
+        basis = bases.pop()
+    if basis == 'polyfit':
+        raise ValueError("Basis 'polyfit' not supported; use 'laguerre', "
+                         "'chebyshev' or 'monomial'.")
+    paths = underlying.get_instrument_values(fixed_seed=fixed_seed)
+    time_grid = underlying.time_grid
+    options = []
+    for vo in valuation_objects:
+        instrument_values, inner_values, time_index_start, \
+            time_index_end = vo.generate_payoff(paths=paths)
+        discount_factors = vo.discount_curve.get_discount_factors(
+            time_grid[time_index_start:time_index_end + 1], dtobjects=True)
+        options.append([vo.name, time_index_start, time_index_end,
+                        inner_values, discount_factors[:, 1], None])
+    buffer = np.empty((bf + 1) * paths.shape[1])
+    start = min(o[1] for o in options)
+    for t in range(max(o[2] for o in options), start - 1, -1):
+        for option in options:
+            name, ts, te, inner_values, dfs, V = option
+            if t == te:
+                option[5] = inner_values[-1].copy()
+            elif ts <= t < te:
+                V *= dfs[t - ts] / dfs[t - ts + 1]
+                if t > ts:
+                    lsm_exercise(paths[t], inner_values[t - ts], V, bf,
+                                 basis, buffer=buffer)
+    return {o[0]: round(np.sum(o[5]) / len(o[5]), accuracy)
+            for o in options}
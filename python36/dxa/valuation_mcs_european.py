@@ -5,6 +5,7 @@
 import numpy as np
 
 from valuation_class import valuation_class
+from variance_reduction import control_variate
 
 class valuation_mcs_european(valuation_class):
     ''' Class to value European options with arbitrary payoff
@@ -14,43 +15,88 @@ class valuation_mcs_european(valuation_class):
     =======
     generate_payoff :
         returns payoffs given the paths and the payoff function
+    get_cash_flows :
+        returns discounted payoffs (after variance reduction, if any)
     present_value : 
         returns present value (Monte Carlo estimator)
+        and optionally its standard error
     '''
 
-    def generate_payoff(self, fixed_seed=False):
+    def generate_payoff(self, fixed_seed=False, paths=None):
         '''
         Parameters
         ==========
         fixed_seed : Boolean
             use same/fixed seed for valuation
+        paths : array
+            (block of) simulated paths to be used instead of
+            the instrument values of the underlying
         '''
+        if paths is None:
+            paths = self.underlying.get_instrument_values(
+                fixed_seed=fixed_seed)
         try:
-            # strike defined?
-            strike = self.strike
-        except:
-            pass
-        paths = self.underlying.get_instrument_values(fixed_seed=fixed_seed)
-        time_grid = self.underlying.time_grid
-        try:
-            time_index = np.where(time_grid == self.maturity)[0]
-            time_index = int(time_index)
+            time_index = self.underlying.get_time_index(self.maturity)
         except:
             print("Maturity date not in time grid of underlying.")
-        maturity_value = paths[time_index]
-        # average value over whole path
-        mean_value = np.mean(paths[:time_index], axis=1)
-        # maximum value over whole path
-        max_value = np.amax(paths[:time_index], axis=1)[-1]
-        # minimum value over whole path
-        min_value = np.amin(paths[:time_index], axis=1)[-1] 
         try:
-            payoff = eval(self.payoff_func)
+            payoff_code = self.compile_payoff()
+            variables = {'self': self, 'paths': paths,
+                         'time_index': time_index,
+                         'maturity_value': paths[time_index]}
+            if 'strike' in self.payoff_variables:
+                variables['strike'] = self.strike
+            # path statistics only if used by the payoff function
+            if 'mean_value' in self.payoff_variables:
+                # average value over whole path
+                variables['mean_value'] = np.mean(paths[:time_index], axis=1)
+            if 'max_value' in self.payoff_variables:
+                # maximum value over whole path
+                variables['max_value'] = np.amax(paths[:time_index],
+                                                 axis=1)[-1]
+            if 'min_value' in self.payoff_variables:
+                # minimum value over whole path
+                variables['min_value'] = np.amin(paths[:time_index],
+                                                 axis=1)[-1]
+            payoff = eval(payoff_code, globals(), variables)
             return payoff
         except:
             print("Error evaluating payoff function.")
 
-    def present_value(self, accuracy=6, fixed_seed=False, full=False):
+    def get_cash_flows(self, paths, discount_factor, adjust=True):
+        ''' Returns the discounted payoffs per path given the (block of)
+        paths; adjusted by the variance reduction technique, if any.
+
+        Parameters
+        ==========
+        paths : array
+            (block of) simulated paths
+        discount_factor : float
+            discount factor for the maturity date
+        adjust : Boolean
+            apply the variance reduction technique (only valid for paths
+            simulated with the current parameters of the underlying)
+        '''
+        if not adjust:
+            return discount_factor * self.generate_payoff(paths=paths)
+        strike = getattr(self, 'strike', None)
+        if self.variance_reduction == 'importance_sampling':
+            shifted = self.underlying.get_shifted_paths(
+                        paths, self.maturity, self.drift_shift, strike)
+            if shifted is not None:
+                shifted_paths, weights = shifted
+                return (discount_factor * weights
+                        * self.generate_payoff(paths=shifted_paths))
+        cash_flow = discount_factor * self.generate_payoff(paths=paths)
+        if self.variance_reduction == 'control_variate':
+            controls = self.underlying.get_control_variates(
+                        paths, self.maturity, strike)
+            if controls is not None:
+                cash_flow = control_variate(cash_flow, *controls)
+        return cash_flow
+
+    def present_value(self, accuracy=6, fixed_seed=False, full=False,
+                      paths=None, std_error=False):
         '''
         Parameters
         ==========
@@ -60,12 +106,46 @@ class valuation_mcs_european(valuation_class):
             use same/fixed seed for valuation
         full : Boolean
             return also full 1d array of present values
+        paths : array
+            simulated paths to be used instead of
+            the instrument values of the underlying
+            (without variance reduction, e.g. for bumped paths)
+        std_error : Boolean
+            return also the standard error of the estimator
         '''
-        cash_flow = self.generate_payoff(fixed_seed=fixed_seed)
         discount_factor = self.discount_curve.get_discount_factors(
                           (self.pricing_date, self.maturity))[0, 1]
-        result = discount_factor * np.sum(cash_flow) / len(cash_flow)
+        # variance reduction only for the paths of the underlying
+        adjust = paths is None
+        if paths is not None or self.underlying.chunk_size is None:
+            if paths is None:
+                paths = self.underlying.get_instrument_values(
+                    fixed_seed=fixed_seed)
+            path_blocks = [paths]
+        else:
+            # chunked valuation: merge the estimators of the
+            # single blocks of paths
+            path_blocks = self.underlying.get_path_blocks(
+                            fixed_seed=fixed_seed)
+        pv_sum = 0.0
+        pv_sum_sq = 0.0
+        count = 0
+        pv_list = []
+        for block in path_blocks:
+            pv = self.get_cash_flows(block, discount_factor, adjust)
+            pv_sum += np.sum(pv)
+            pv_sum_sq += np.sum(pv ** 2)
+            count += len(pv)
+            if full:
+                pv_list.append(pv)
+        result = pv_sum / count
+        results = [round(result, accuracy)]
+        if std_error:
+            variance = max(pv_sum_sq / count - result ** 2, 0.0)
+            results.append(round(np.sqrt(variance / (count - 1)), accuracy))
         if full:
-            return round(result, accuracy), discount_factor * cash_flow
+            results.append(np.concatenate(pv_list))
+        if len(results) == 1:
+            return results[0]
         else:
-            return round(result, accuracy)
\ No newline at end of file
+            return tuple(results)
\ No newline at end of file
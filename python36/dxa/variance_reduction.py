@@ -0,0 +1,31 @@
+#
+# DX Library Valuation
+# variance_reduction.py
+#
+import numpy as np
+
+
+def control_variate(values, controls, control_means):
+    ''' Returns the values adjusted by (multiple) control variates
+    with regression-based (optimal) coefficients.
+
+    Parameters
+    ==========
+    values : array (I,)
+        present values per path
+    controls : array (n, I)
+        control variates per path
+    control_means : array (n,)
+        known expected values of the control variates
+
+    Results
+    =======
+    adjusted : array (I,)
+        adjusted present values per path (same expected value)
+    '''
+    controls = np.atleast_2d(controls)
+    deviations = controls - np.mean(controls, axis=1, keepdims=True)
+    # regression of the values on the control variates
+    b = np.linalg.lstsq(deviations.T, values - np.mean(values),
+                        rcond=-1)[0]
+    return values - np.dot(b, controls - np.reshape(control_means, (-1, 1)))
@@ -11,4 +11,5 @@ create table users (
   id integer primary key autoincrement,
   name text not null,
   password text not null
-);
\ No newline at end of file
+);
+create index users_name on users (name);
\ No newline at end of file
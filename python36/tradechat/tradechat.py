@@ -5,10 +5,14 @@
 # 
 
 import os
+import json
+import queue
+import threading
+import collections
 import datetime as dt
 from sqlite3 import dbapi2 as sqlite3
 from flask import Flask, request, session, g, redirect, url_for, abort, \
-     render_template, flash
+     render_template, flash, Response
 
 
 # the application object from the main Flask class
@@ -21,22 +25,126 @@ app.config.update(dict(
     DEBUG=True,
     SECRET_KEY='secret_key',
       # use secure key here for real applications
+    PER_PAGE=50,
+      # number of comments per page
+    POOL_SIZE=8,
+      # number of idle connections kept open for reuse
+    FEED_SIZE=1000,
+      # number of recent comments kept in memory for streaming
+    STREAM_TIMEOUT=15,
+      # seconds between keep-alive messages of the stream
 ))
 app.config.from_envvar('TC_SETTINGS', silent=True)
   # do not complain if no config file exists
 
+class comment_feed(object):
+    ''' Class for the in-memory fan-out buffer of the latest comments
+    (streamed to the connected clients).
+
+    Attributes
+    ==========
+    size : int
+        number of comments kept in memory
+
+    Methods
+    =======
+    seed :
+        sets the id from which on the buffer is complete
+    reset :
+        empties the buffer
+    publish :
+        adds a new comment and wakes up the waiting clients
+    get_since :
+        returns the comments newer than a given id
+    '''
+
+    def __init__(self, size=1000):
+        self.comments = collections.deque(maxlen=size)
+        self.condition = threading.Condition()
+        self.start = None
+          # id of the last comment before the buffer
+
+    def seed(self, get_last_id):
+        ''' Sets the start of the buffer (if not yet set) to the id
+        returned by get_last_id (called while holding the lock). '''
+        with self.condition:
+            if self.start is None:
+                self.start = get_last_id()
+
+    def reset(self):
+        with self.condition:
+            self.comments.clear()
+            self.start = None
+
+    def publish(self, comment):
+        ''' Adds the comment (dict with 'id') to the buffer. '''
+        with self.condition:
+            if self.start is None:
+                return  # no client streaming yet
+            if len(self.comments) == self.comments.maxlen:
+                self.start = self.comments[0]['id']
+            self.comments.append(comment)
+            self.condition.notify_all()
+
+    def get_since(self, last_id, timeout=None):
+        ''' Returns the comments with id larger than last_id (waiting up
+        to timeout seconds for new ones) or None if these are no longer
+        (completely) in the buffer. '''
+        with self.condition:
+            if self.start is None or last_id < self.start:
+                return None
+            if not self.comments or self.comments[-1]['id'] <= last_id:
+                self.condition.wait(timeout)
+            if self.start is None or last_id < self.start:
+                return None
+            comments = []
+            for comment in reversed(self.comments):
+                if comment['id'] <= last_id:
+                    break
+                comments.append(comment)
+            return comments[::-1]
+
+
+feed = comment_feed(app.config['FEED_SIZE'])
+
+# pools of idle connections to the TC database (by database file),
+# shared by the request threads
+connection_pools = {}
+pools_lock = threading.Lock()
+
+
 def connect_db():
     ''' Connects to the TC database.'''
-    rv = sqlite3.connect(app.config['DATABASE'])
+    rv = sqlite3.connect(app.config['DATABASE'], check_same_thread=False)
+      # pooled connections are used by different threads
     rv.row_factory = sqlite3.Row
+    rv.execute('pragma journal_mode=wal')
+      # readers do not block the writer (and vice versa)
+    try:
+        rv.execute('create index if not exists users_name on users (name)')
+          # index also for databases created before
+    except sqlite3.OperationalError:
+        pass  # no tables yet (see init_db)
     return rv
 
 
+def get_pool():
+    ''' Returns the pool of idle connections to the TC database. '''
+    with pools_lock:
+        if app.config['DATABASE'] not in connection_pools:
+            connection_pools[app.config['DATABASE']] = queue.LifoQueue(
+                app.config['POOL_SIZE'])
+        return connection_pools[app.config['DATABASE']]
+
+
 def get_db():
-    ''' Opens a new connection to the TC database. '''
+    ''' Returns a connection to the TC database from the pool
+    (a new one if none is idle). '''
     if not hasattr(g, 'sqlite_db'):
-        # open only if none exists yet
-        g.sqlite_db = connect_db()
+        try:
+            g.sqlite_db = get_pool().get_nowait()
+        except queue.Empty:
+            g.sqlite_db = connect_db()
     return g.sqlite_db
 
 
@@ -48,23 +156,50 @@ def init_db():
             db.cursor().executescript(f.read())
                # creates entries and users tables
         db.commit()
+    feed.reset()
 
 
 @app.teardown_appcontext
 def close_db(error):
-    ''' Closes the TC database at the end of the request. '''
+    ''' Returns the TC database connection to the pool at the end of
+    the request (closes it if the pool is full). '''
     if hasattr(g, 'sqlite_db'):
-        g.sqlite_db.close()
+        db = g.sqlite_db
+        if db.in_transaction:
+            db.rollback()
+              # discard changes not committed by the request
+        try:
+            get_pool().put_nowait(db)
+        except queue.Full:
+            db.close()
 
 
 @app.route('/')
 def show_entries():
-    ''' Renders all entries of the TC database. '''
+    ''' Renders the latest entries of the TC database (keyset
+    pagination: entries older than the id given as 'before'). '''
     db = get_db()
-    query = 'select comment, user, time from comments order by id desc'
-    cursor = db.execute(query)
+    per_page = app.config['PER_PAGE']
+    before = request.args.get('before', type=int)
+    if before is None:
+        query = ('select id, comment, user, time from comments '
+                 'order by id desc limit ?')
+        cursor = db.execute(query, (per_page + 1,))
+    else:
+        query = ('select id, comment, user, time from comments '
+                 'where id < ? order by id desc limit ?')
+        cursor = db.execute(query, (before, per_page + 1))
     comments = cursor.fetchall()
-    return render_template('show_entries.html', comments=comments)
+    # id for the link to older entries (if any)
+    older = comments[per_page - 1]['id'] if len(comments) > per_page \
+        else None
+    # id for the stream of new entries (first page only)
+    latest = None
+    if before is None:
+        latest = comments[0]['id'] if comments else 0
+    return render_template('show_entries.html',
+                           comments=comments[:per_page], older=older,
+                           latest=latest)
 
 
 @app.route('/register', methods=['GET', 'POST'])
@@ -116,13 +251,52 @@ def add_entry():
         abort(401)
     db = get_db()
     now = dt.datetime.now()
-    db.execute('insert into comments (comment, user, time) values (?, ?, ?)',
-            [request.form['text'], app.config['USERNAME'], str(now)[:-7]])
+    comment = {'comment': request.form['text'],
+               'user': app.config['USERNAME'], 'time': str(now)[:-7]}
+    cursor = db.execute('insert into comments (comment, user, time) '
+                        'values (?, ?, ?)',
+                        [comment['comment'], comment['user'], comment['time']])
     db.commit()
+    comment['id'] = cursor.lastrowid
+    feed.publish(comment)
+      # pushed to the streaming clients
     flash('Your comment was successfully added.')
     return redirect(url_for('show_entries'))
 
 
+@app.route('/stream')
+def stream_entries():
+    ''' Streams the new entries as server-sent events, starting after
+    the id given as 'last_id' (or by the Last-Event-ID header). '''
+    db = get_db()
+    feed.seed(lambda: db.execute(
+        'select coalesce(max(id), 0) from comments').fetchone()[0])
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_id', 0, type=int)
+    backlog = feed.get_since(last_id, timeout=0)
+    if backlog is None:
+        # comments no longer in memory are read from the database
+        query = ('select id, comment, user, time from comments '
+                 'where id > ? order by id')
+        backlog = [dict(row) for row in db.execute(query, (last_id,))]
+    timeout = app.config['STREAM_TIMEOUT']
+
+    def generate(comments, last_id):
+        while True:
+            for comment in comments:
+                last_id = comment['id']
+                yield 'id: %d\ndata: %s\n\n' % (last_id, json.dumps(comment))
+            comments = feed.get_since(last_id, timeout)
+            if comments is None:
+                break  # client too slow, reconnects with Last-Event-ID
+            if not comments:
+                yield ': keep-alive\n\n'
+
+    return Response(generate(backlog, last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+
 @app.route('/logout')
 def logout():
     ''' Logs out the current user. '''
@@ -134,4 +308,5 @@ def logout():
 if __name__ == '__main__':
     init_db()  # comment out if data in current
                # TC database is to be kept
-    app.run()
+    app.run(threaded=True)
+      # one thread per streaming client
@@ -0,0 +1,107 @@
+#
+# Valuation of European volatility options
+# in Gruenbichler-Longstaff (1996) model
+# square-root diffusion framework
+# -- calibration to option quotes
+#
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.optimize as spo
+
+from vol_pricing_formula import calculate_option_value
+
+# default ranges for the starting values of kappa, theta, sigma
+# (multi-start calibration)
+START_RANGES = ((0.1, 10.), (5., 50.), (0.5, 10.))
+
+
+def calculate_residuals(x, V0, zeta, T, r, K, prices):
+    ''' Returns the differences between model and market prices
+    for all options (vectorized).
+
+    Parameters
+    ==========
+    x : array
+        logarithms of kappa, theta, sigma
+    V0 : float
+        current volatility level
+    zeta : float
+        volatility risk premium
+    T : array
+        times-to-maturity of the options
+    r : float
+        risk-free short rate
+    K : array
+        strike prices of the options
+    prices : array
+        market prices of the options
+    '''
+    kappa, theta, sigma = np.exp(x)
+    return calculate_option_value(V0, kappa, theta, sigma, zeta,
+                                  T, r, K) - prices
+
+
+def fit_from_start(p0, V0, zeta, T, r, K, prices):
+    ''' Returns the parameters (kappa, theta, sigma) and the mean-squared
+    error from a Levenberg-Marquardt fit starting at p0. '''
+    # logarithms keep the parameters positive without bounds
+    result = spo.least_squares(calculate_residuals, np.log(p0),
+                               method='lm',
+                               args=(V0, zeta, T, r, K, prices))
+    return np.exp(result.x), np.mean(result.fun ** 2)
+
+
+def calibrate_model(V0, T, r, K, prices, zeta=0.0, p0=None, starts=8,
+                    workers=None, seed=1000):
+    ''' Calibrates the GL96 model to volatility option quotes.
+
+    With p0 (e.g. the result of the previous calibration) a single
+    least-squares fit is started from p0 (warm start); otherwise fits
+    are started from several random points, optionally in parallel,
+    and the best fit is returned.
+
+    Parameters
+    ==========
+    V0 : float
+        current volatility level
+    T : array
+        times-to-maturity of the options
+    r : float
+        risk-free short rate
+    K : array
+        strike prices of the options
+    prices : array
+        market prices of the options
+    zeta : float
+        volatility risk premium
+    p0 : tuple
+        starting values for kappa, theta, sigma (warm start)
+    starts : int
+        number of random starting points (without p0)
+    workers : int
+        number of worker processes for the multi-start (None: serial)
+    seed : int
+        seed for the random starting points
+
+    Returns
+    =======
+    params : tuple
+        calibrated kappa, theta, sigma
+    MSE : float
+        mean-squared error of the calibrated model
+    '''
+    args = (V0, zeta, np.asarray(T, dtype=float), r,
+            np.asarray(K, dtype=float), np.asarray(prices, dtype=float))
+    if p0 is not None:
+        params, MSE = fit_from_start(np.asarray(p0, dtype=float), *args)
+        return tuple(params), MSE
+    low, high = np.array(START_RANGES).T
+    points = np.random.RandomState(seed).uniform(low, high, (starts, 3))
+    if workers is None:
+        results = [fit_from_start(p, *args) for p in points]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(fit_from_start, points,
+                                        *[[a] * starts for a in args]))
+    params, MSE = min(results, key=lambda res: res[1])
+    return tuple(params), MSE
@@ -4,7 +4,8 @@
 # square-root diffusion framework
 # -- WSGI application for web service
 #
-from vol_pricing_service import get_option_value
+from vol_pricing_service import get_option_value, get_option_values, \
+    get_cache_stats
 from werkzeug.wrappers import Request, Response
 from werkzeug.serving import run_simple
 
@@ -12,6 +13,17 @@ from werkzeug.serving import run_simple
 def application(environ, start_response):
     request = Request(environ)
     # wrap environ in new object
+    if request.path == '/bulk':
+        # many options per request as JSON list
+        text, error = get_option_values(request.get_data(as_text=True))
+        response = Response(text, status=400 if error else 200,
+                            mimetype='text/plain' if error
+                            else 'application/json')
+        return response(environ, start_response)
+    if request.path == '/stats':
+        # hit/miss statistics of the value cache
+        response = Response(get_cache_stats(), mimetype='application/json')
+        return response(environ, start_response)
     text = get_option_value(request.args)
     # provide all parameters of call to function
     # get back either error message or option value
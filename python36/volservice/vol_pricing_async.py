@@ -0,0 +1,275 @@
+#
+# Valuation of European volatility options
+# in Gruenbichler-Longstaff (1996) model
+# square-root diffusion framework
+# -- asyncio web service with request batching
+#
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+import numpy as np
+
+from vol_pricing_service import check_parameters, get_parameter_rows, \
+    calculate_option_values, parse_options, get_cache_stats, value_cache
+
+# http://127.0.0.1:4000/?V0=0.2&kappa=2.0&theta=0.21&sigma=0.02&zeta=0.0&T=1.0&r=0.05&K=0.19
+# http://127.0.0.1:4000/bulk (POST, JSON list of options)
+# http://127.0.0.1:4000/stats (statistics of the value cache)
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+# maximum size (in bytes) of a request body
+MAX_BODY_SIZE = 10 * 1024 ** 2
+
+
+class request_error(Exception):
+    ''' Error for requests that are answered with status (body not
+    completely read, i.e. the connection is closed afterwards). '''
+
+    def __init__(self, status, text):
+        super(request_error, self).__init__(text)
+        self.status = status
+
+
+class request_batcher(object):
+    ''' Class to collect concurrent pricing requests and to value
+    them in batches with one vectorized call.
+
+    Attributes
+    ==========
+    delay : float
+        time (in seconds) to wait for further requests
+    max_size : int
+        number of options that triggers a batch immediately
+    executor : instance of concurrent.futures.Executor
+        executor for the valuation (None: default thread pool)
+    loop : instance of asyncio event loop
+        event loop of the service
+
+    Methods
+    =======
+    price :
+        coroutine returning the values of the options given
+    flush :
+        starts the valuation of the requests collected so far
+    run_batch :
+        coroutine valuing a batch and distributing the results
+    '''
+
+    def __init__(self, delay=0.002, max_size=10000, executor=None,
+                 loop=None):
+        self.delay = delay
+        self.max_size = max_size
+        self.executor = executor
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.pending = []
+        self.size = 0
+        self.handle = None
+
+    async def price(self, rows):
+        ''' Returns the values of the options (array of shape (n, 8),
+        see get_parameter_rows) as part of the next batch. '''
+        future = self.loop.create_future()
+        self.pending.append((rows, future))
+        self.size += len(rows)
+        if self.size >= self.max_size:
+            self.flush()
+        elif self.handle is None:
+            self.handle = self.loop.call_later(self.delay, self.flush)
+        return await future
+
+    def flush(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        batch, self.pending, self.size = self.pending, [], 0
+        if batch:
+            asyncio.ensure_future(self.run_batch(batch), loop=self.loop)
+
+    async def run_batch(self, batch):
+        rows = np.concatenate([r for r, future in batch])
+        try:
+            values = await self.loop.run_in_executor(
+                self.executor, calculate_option_values, rows)
+        except Exception as e:
+            for r, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        start = 0
+        for r, future in batch:
+            if not future.done():
+                future.set_result(values[start:start + len(r)])
+            start += len(r)
+
+
+async def handle_request(method, target, body, batcher):
+    ''' Returns status, content type and text of the response. '''
+    url = urlsplit(target)
+    if url.path == '/bulk':
+        # many options per request as JSON list
+        try:
+            rows = parse_options(body.decode('utf-8'))
+        except UnicodeDecodeError:
+            return 400, 'text/plain', 'Invalid UTF-8 body\n'
+        if isinstance(rows, str):
+            return 400, 'text/plain', rows
+        values = await batcher.price(rows)
+        return 200, 'application/json', json.dumps(
+            {'values': values.tolist()})
+    if url.path == '/stats':
+        return 200, 'application/json', get_cache_stats()
+    if url.path != '/':
+        return 404, 'text/plain', 'Not found\n'
+    data = dict(parse_qsl(url.query))
+    errormsg = check_parameters(data)
+    if errormsg != '':
+        return 200, 'text/html', errormsg
+    rows = get_parameter_rows([data])
+    if isinstance(rows, str):
+        return 400, 'text/plain', rows
+    # normalized parameters as cache key
+    key = tuple(rows[0].tolist())
+    result = value_cache.get(key)
+    if result is None:
+        values = await batcher.price(rows)
+        result = str(float(values[0]))
+        value_cache.put(key, result)
+    return 200, 'text/html', result
+
+
+def parse_size(text, base=10):
+    ''' Returns the size given by a Content-Length header or a chunk
+    size line; request_error (400) if invalid. '''
+    try:
+        size = int(text, base)
+    except ValueError:
+        raise request_error(400, 'Invalid body size\n')
+    if size < 0:
+        raise request_error(400, 'Invalid body size\n')
+    return size
+
+
+async def read_body(reader, writer, headers):
+    ''' Returns the body of the request (Content-Length or chunked
+    transfer encoding) of at most MAX_BODY_SIZE bytes (request_error with
+    413 otherwise); answers 'Expect: 100-continue' first. '''
+    chunked = 'chunked' in headers.get('transfer-encoding', '').lower()
+    length = 0
+    if not chunked:
+        length = parse_size(headers.get('content-length', '0'))
+        if length > MAX_BODY_SIZE:
+            raise request_error(413, 'Request body too large\n')
+    if headers.get('expect', '').lower() == '100-continue':
+        # e.g. curl for bodies larger than 1 KB
+        writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        await writer.drain()
+    if chunked:
+        chunks = []
+        while True:
+            line = (await reader.readline()).split(b';')[0]
+            size = parse_size(line.decode('latin-1').strip(), 16)
+            if size == 0:
+                break
+            length += size
+            if length > MAX_BODY_SIZE:
+                raise request_error(413, 'Request body too large\n')
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()  # CRLF after the chunk
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass  # trailer fields (ignored)
+        return b''.join(chunks)
+    return await reader.readexactly(length) if length else b''
+
+
+async def handle_connection(reader, writer, batcher):
+    ''' Serves the HTTP/1.1 requests of a client connection
+    (with keep-alive). Supports Content-Length and chunked request
+    bodies up to MAX_BODY_SIZE bytes. '''
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            method, target, version = line.decode('latin-1').split()
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, _, value = line.decode('latin-1').partition(':')
+                headers[key.strip().lower()] = value.strip()
+            keep_alive = (version == 'HTTP/1.1' and
+                          headers.get('connection', '').lower() != 'close')
+            try:
+                body = await read_body(reader, writer, headers)
+                status, content_type, text = await handle_request(
+                    method, target, body, batcher)
+            except request_error as e:
+                status, content_type, text = e.status, 'text/plain', str(e)
+                keep_alive = False
+            except (ConnectionError, asyncio.IncompleteReadError):
+                raise  # client gone
+            except Exception as e:
+                # client errors are answered by handle_request
+                status, content_type, text = 500, 'text/plain', \
+                    'Error: %s\n' % e
+            payload = text.encode('utf-8')
+            writer.write(('HTTP/1.1 %d %s\r\nContent-Type: %s\r\n'
+                          'Content-Length: %d\r\nConnection: %s\r\n\r\n'
+                          % (status, REASONS[status], content_type,
+                             len(payload),
+                             'keep-alive' if keep_alive else 'close')
+                          ).encode('latin-1') + payload)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        # client gone or malformed request
+        pass
+    finally:
+        writer.close()
+
+
+def serve(host='localhost', port=4000, delay=0.002, max_size=10000,
+          workers=None):
+    ''' Runs the batching web service until interrupted.
+
+    Parameters
+    ==========
+    host : string
+        host name to bind to
+    port : int
+        port to bind to
+    delay : float
+        time (in seconds) to wait for further requests per batch
+    max_size : int
+        number of options that triggers a batch immediately
+    workers : int
+        number of worker processes for the valuation
+        (None: default thread pool of the event loop)
+    '''
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    executor = None
+    if workers is not None:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    batcher = request_batcher(delay, max_size, executor, loop)
+    server = loop.run_until_complete(asyncio.start_server(
+        lambda reader, writer: handle_connection(reader, writer, batcher),
+        host, port))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        if executor is not None:
+            executor.shutdown()
+        loop.close()
+
+if __name__ == '__main__':
+    serve()
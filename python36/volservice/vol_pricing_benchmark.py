@@ -0,0 +1,199 @@
+#
+# Valuation of European volatility options
+# in Gruenbichler-Longstaff (1996) model
+# square-root diffusion framework
+# -- throughput and latency benchmark for the web service
+#
+# python vol_pricing_benchmark.py --mode inprocess --concurrency 8
+# python vol_pricing_benchmark.py --mode socket --mix single,cached,bulk
+# python vol_pricing_benchmark.py --url http://127.0.0.1:4000
+#
+import argparse
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+import numpy as np
+from werkzeug.serving import make_server, WSGIRequestHandler
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from vol_pricing import application
+from vol_pricing_service import PARAM_NAMES
+
+
+def get_parameters(rng, cached=False):
+    ''' Returns random option parameters (from a small set of
+    contracts for cached=True). '''
+    if cached:
+        K = 15. + rng.randint(0, 5)
+        T = 0.25 * (1 + rng.randint(0, 2))
+        V0 = 17.5
+    else:
+        K = rng.uniform(10., 30.)
+        T = rng.uniform(0.05, 2.)
+        V0 = rng.uniform(15., 25.)
+    return [V0, 2.0, 20.0, 1.0, 0.0, T, 0.01, K]
+
+
+def make_requests(mix=('single',), n=1000, bulk_size=100, seed=1000):
+    ''' Returns n requests (method, path, body) for the request mix.
+
+    Parameters
+    ==========
+    mix : tuple
+        request types drawn with equal probability: 'single'
+        (random option), 'cached' (few repeated options) or 'bulk'
+        (bulk_size random options per request)
+    n : int
+        number of requests
+    bulk_size : int
+        number of options per bulk request
+    seed : int
+        seed for the random parameters
+    '''
+    rng = np.random.RandomState(seed)
+    requests = []
+    for i in range(n):
+        kind = mix[rng.randint(0, len(mix))]
+        if kind == 'bulk':
+            body = json.dumps([get_parameters(rng)
+                               for j in range(bulk_size)])
+            requests.append(('POST', '/bulk', body.encode('utf-8')))
+        else:
+            params = get_parameters(rng, kind == 'cached')
+            query = urlencode(list(zip(PARAM_NAMES, params)))
+            requests.append(('GET', '/?' + query, None))
+    return requests
+
+
+def run_in_process(requests, concurrency=1):
+    ''' Drives the WSGI application in-process (no sockets) and returns
+    the latencies (in seconds) and the total time. '''
+    local = threading.local()
+
+    def send(request):
+        if not hasattr(local, 'client'):
+            # response objects (plain tuples with werkzeug 0.12 otherwise)
+            local.client = Client(application, Response)
+        method, path, body = request
+        t0 = time.perf_counter()
+        response = local.client.open(path, method=method, data=body)
+        response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError('Status %d for %s' % (response.status_code,
+                                                     path))
+        return time.perf_counter() - t0
+
+    return run_requests(send, requests, concurrency)
+
+
+def run_over_socket(requests, concurrency=1, host='127.0.0.1', port=4000):
+    ''' Sends the requests over HTTP (one keep-alive connection per
+    client thread) and returns the latencies (in seconds) and the
+    total time. '''
+    local = threading.local()
+
+    def send(request):
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection(host, port)
+        method, path, body = request
+        t0 = time.perf_counter()
+        local.connection.request(method, path, body=body)
+        response = local.connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError('Status %d for %s' % (response.status, path))
+        return time.perf_counter() - t0
+
+    return run_requests(send, requests, concurrency)
+
+
+def run_requests(send, requests, concurrency):
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(send, requests))
+    return np.array(latencies), time.perf_counter() - t0
+
+
+class quiet_request_handler(WSGIRequestHandler):
+    ''' Request handler without logging of the single requests. '''
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def start_server(host='127.0.0.1', port=0):
+    ''' Starts the WSGI application on a local socket (multi-threaded
+    werkzeug server) in a background thread and returns the server. '''
+    server = make_server(host, port, application, threaded=True,
+                         request_handler=quiet_request_handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def get_statistics(latencies, total):
+    ''' Returns requests/sec and the p50/p99 latencies (in ms). '''
+    return {'requests': len(latencies),
+            'requests/sec': len(latencies) / total,
+            'p50 (ms)': np.percentile(latencies, 50) * 1000,
+            'p99 (ms)': np.percentile(latencies, 99) * 1000}
+
+
+def run_benchmark(mode='inprocess', mix=('single',), n=1000,
+                  concurrency=1, bulk_size=100, url=None):
+    ''' Runs the benchmark and returns the statistics.
+
+    Parameters
+    ==========
+    mode : string
+        'inprocess' (WSGI application called directly) or 'socket'
+        (local werkzeug server); ignored if url is given
+    mix : tuple
+        request types ('single', 'cached', 'bulk')
+    n : int
+        number of requests
+    concurrency : int
+        number of concurrent clients
+    bulk_size : int
+        number of options per bulk request
+    url : string
+        base URL of a running service (e.g. the asyncio service)
+    '''
+    requests = make_requests(mix, n, bulk_size)
+    if url is not None:
+        parts = urlsplit(url)
+        return get_statistics(*run_over_socket(
+            requests, concurrency, parts.hostname, parts.port or 80))
+    if mode == 'inprocess':
+        return get_statistics(*run_in_process(requests, concurrency))
+    server = start_server()
+    try:
+        return get_statistics(*run_over_socket(
+            requests, concurrency, '127.0.0.1', server.server_port))
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark of the volatility option pricing service')
+    parser.add_argument('--mode', default='inprocess',
+                        choices=['inprocess', 'socket'])
+    parser.add_argument('--url', default=None,
+                        help='base URL of a running service')
+    parser.add_argument('--mix', default='single',
+                        help='comma separated request types '
+                             '(single, cached, bulk)')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--bulk-size', type=int, default=100)
+    args = parser.parse_args()
+    stats = run_benchmark(args.mode, tuple(args.mix.split(',')),
+                          args.requests, args.concurrency, args.bulk_size,
+                          args.url)
+    for key in stats:
+        print('%-14s %10.2f' % (key, stats[key]))
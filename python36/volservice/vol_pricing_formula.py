@@ -13,6 +13,10 @@ import numpy as np
 def calculate_option_value(V0, kappa, theta, sigma, zeta, T, r, K):
     ''' Calculation of European call option price in GL96 model.
 
+    All parameters can also be given as NumPy arrays which are
+    broadcast against each other, e.g. strikes K of shape (n, 1) and
+    maturities T of shape (m,) for a whole option surface of shape (n, m).
+
     Parameters
     ==========
     V0 : float
@@ -25,32 +29,42 @@ def calculate_option_value(V0, kappa, theta, sigma, zeta, T, r, K):
         volatility of volatility
     zeta :
         volatility risk premium
-    T : float
+    T : float or array
         time-to-maturity
     r : float
         risk-free short rate
-    K : float
+    K : float or array
         strike price of the option
 
     Returns
     =======
-    value : float
+    value : float or array
         net present value of volatility call option
     '''
+    T = np.asarray(T, dtype=float)
+    K = np.asarray(K, dtype=float)
     D = np.exp(-r * T)  # discount factor
 
     # variables
     alpha = kappa * theta
     beta = kappa + zeta
-    gamma = 4 * beta / (sigma ** 2 * (1 - np.exp(-beta * T)))
+    ebT = np.exp(-beta * T)
+    gamma = 4 * beta / (sigma ** 2 * (1 - ebT))
     nu = 4 * alpha / sigma ** 2
-    lamb = gamma * np.exp(-beta * T) * V0
-    cx1 = 1 - ncx2.cdf(gamma * K, nu + 4, lamb)
-    cx2 = 1 - ncx2.cdf(gamma * K, nu + 2, lamb)
-    cx3 = 1 - ncx2.cdf(gamma * K, nu, lamb)
+    lamb = gamma * ebT * V0
+    x = gamma * K
+    # all three noncentral chi-square survival functions in one call
+    # (degrees of freedom nu + 4, nu + 2, nu along the first axis)
+    nu = np.asarray(nu)
+    ndim = np.broadcast(x, lamb, nu).ndim
+    dfs = np.reshape(np.add.outer([4., 2., 0.], nu),
+                     (3,) + (1,) * (ndim - nu.ndim) + nu.shape)
+    cx1, cx2, cx3 = ncx2.sf(x, dfs, lamb)
 
     # formula for European call price
-    value = (D * np.exp(-beta * T) * V0 * cx1
-             + D * (alpha / beta) * (1 - np.exp(-beta * T))
+    value = (D * ebT * V0 * cx1
+             + D * (alpha / beta) * (1 - ebT)
              * cx2 - D * K * cx3)
+    if np.ndim(value) == 0:
+        return float(value)
     return value
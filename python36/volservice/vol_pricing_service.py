@@ -4,6 +4,12 @@
 # square-root diffusion framework
 # -- parameter dictionary & web service function
 #
+from collections import OrderedDict
+import json
+import threading
+import time
+import numpy as np
+
 from vol_pricing_formula import calculate_option_value
 
 # model parameters
@@ -21,28 +27,168 @@ PARAMS = {
     'K': 'strike'
 }
 
+# order of the parameters in calculate_option_value
+PARAM_NAMES = ('V0', 'kappa', 'theta', 'sigma', 'zeta', 'T', 'r', 'K')
+
+
+class result_cache(object):
+    ''' Class for a bounded LRU cache with time-to-live for option
+    values keyed by the (normalized) parameter tuple.
+
+    Attributes
+    ==========
+    maxsize : int
+        maximum number of cached values
+    ttl : float
+        time-to-live of a cached value in seconds
+    hits : int
+        number of requests answered from the cache
+    misses : int
+        number of requests not answered from the cache
+
+    Methods
+    =======
+    get :
+        returns the cached value for key (None if not available)
+    put :
+        adds a value to the cache
+    get_stats :
+        returns the cache statistics as dictionary
+    '''
+
+    def __init__(self, maxsize=1024, ttl=60.):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                value, expires = self.values[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if expires < time.monotonic():
+                del self.values[key]
+                self.misses += 1
+                return None
+            self.values.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.values[key] = (value, time.monotonic() + self.ttl)
+            self.values.move_to_end(key)
+            if len(self.values) > self.maxsize:
+                # remove least recently used value
+                self.values.popitem(last=False)
+
+    def get_stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self.values), 'maxsize': self.maxsize,
+                    'ttl': self.ttl}
+
+
+# cache for the values of single options
+value_cache = result_cache()
+
 # function for web service
 
 
-def get_option_value(data):
-    ''' A helper function for web service. '''
+def check_parameters(data):
+    ''' Returns the error message for missing parameters ('' if all
+    parameters are provided). '''
     errorline = 'Missing parameter %s (%s)\n'
     errormsg = ''
     for para in PARAMS:
         if para not in data.keys():
             # check if all parameters are provided
             errormsg += errorline % (para, PARAMS[para])
+    return errormsg
+
+
+def get_option_value(data):
+    ''' A helper function for web service. '''
+    errormsg = check_parameters(data)
     if errormsg != '':
         return errormsg
     else:
-        result = calculate_option_value(
-            float(data['V0']),
-            float(data['kappa']),
-            float(data['theta']),
-            float(data['sigma']),
-            float(data['zeta']),
-            float(data['T']),
-            float(data['r']),
-            float(data['K'])
-        )
-        return str(result)
+        # normalized parameters as cache key
+        key = tuple(float(data[para]) for para in PARAM_NAMES)
+        result = value_cache.get(key)
+        if result is None:
+            result = str(calculate_option_value(*key))
+            value_cache.put(key, result)
+        return result
+
+
+def get_cache_stats():
+    ''' A helper function for the stats web service. '''
+    return json.dumps(value_cache.get_stats())
+
+
+def get_parameter_rows(options):
+    ''' Returns the parameters of many options as array of shape
+    (n, 8) in the order of PARAM_NAMES or an error message.
+
+    Parameters
+    ==========
+    options : list
+        parameter dictionaries or lists (in the order of PARAM_NAMES)
+    '''
+    rows = []
+    for i, option in enumerate(options):
+        if isinstance(option, dict):
+            missing = [para for para in PARAM_NAMES if para not in option]
+            if missing:
+                return 'Missing parameter(s) %s for option %d\n' % (
+                    ', '.join(missing), i)
+            option = [option[para] for para in PARAM_NAMES]
+        elif not isinstance(option, (list, tuple)):
+            return 'Option %d needs to be a list or an object\n' % i
+        if len(option) != len(PARAM_NAMES):
+            return 'Option %d needs the %d parameters %s\n' % (
+                i, len(PARAM_NAMES), ', '.join(PARAM_NAMES))
+        rows.append(option)
+    try:
+        return np.array(rows, dtype=float).reshape((-1, len(PARAM_NAMES)))
+    except (TypeError, ValueError):
+        return 'Parameters need to be numbers\n'
+
+
+def calculate_option_values(rows):
+    ''' Returns the values of many options (array of shape (n, 8),
+    see get_parameter_rows) from one vectorized call. '''
+    if len(rows) == 0:
+        return np.zeros(0)
+    return np.atleast_1d(calculate_option_value(*rows.T))
+
+
+def parse_options(body):
+    ''' Returns the parameters of the options in the JSON body, a list
+    of options (or an object with such a list as 'options'), as array of
+    shape (n, 8) or an error message. '''
+    try:
+        options = json.loads(body)
+    except ValueError:
+        return 'Invalid JSON\n'
+    if isinstance(options, dict):
+        options = options.get('options')
+    if not isinstance(options, list):
+        return 'Expecting a list of options\n'
+    return get_parameter_rows(options)
+
+
+def get_option_values(body):
+    ''' A helper function for the bulk web service. Returns the JSON
+    response text (or an error message) and an error flag. '''
+    rows = parse_options(body)
+    if isinstance(rows, str):
+        return rows, True
+    values = calculate_option_values(rows)
+    return json.dumps({'values': values.tolist()}), False